@@ -36,12 +36,9 @@ import asyncio
 import json
 import logging
 import ssl
-import threading
 import time
-from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
-import pandas as pd
 import requests
 import websockets
 
@@ -51,6 +48,7 @@ from alphahub_parser import (
     _DEFAULT_HEADERS,
     _derive_status,
     _gate_acquire,
+    _json_loads,
     _ms_to_gap,
     _ms_to_laptime,
     _ms_to_runtime,
@@ -298,7 +296,7 @@ class AlphaHubHub:
                 if env and env.get('event') == 'pusher:connection_established':
                     inner = env.get('data') or {}
                     if isinstance(inner, str):
-                        inner = json.loads(inner)
+                        inner = _json_loads(inner)
                     socket_id = inner.get('socket_id')
             if not socket_id:
                 raise RuntimeError('No pusher:connection_established received')
@@ -402,7 +400,7 @@ class AlphaHubHub:
         # to the channel handler.
         while isinstance(data, str):
             try:
-                data = json.loads(data)
+                data = _json_loads(data)
             except Exception:
                 data = {'raw': data}
                 break
@@ -417,7 +415,7 @@ class AlphaHubHub:
         if isinstance(raw, bytes):
             raw = raw.decode('utf-8', 'replace')
         try:
-            return json.loads(raw)
+            return _json_loads(raw)
         except Exception:
             return None
 
@@ -484,7 +482,7 @@ class AlphaHubChannel(TrackSpecificParser):
         self.is_connected = False
 
     # ----- standings + ingest (lifted from old AlphaHubParser) ---------
-    def get_current_standings(self) -> pd.DataFrame:
+    def get_current_standings(self) -> List[Dict[str, str]]:
         rows = []
         for num, c in self.competitors.items():
             pos = c.get('Position') or c.get('Rank') or c.get('Pos')
@@ -522,7 +520,7 @@ class AlphaHubChannel(TrackSpecificParser):
             except (ValueError, TypeError):
                 return 9999
         rows.sort(key=_pkey)
-        return pd.DataFrame(rows)
+        return rows
 
     def _apply_delta(self, payload: Dict[str, Any]) -> bool:
         # Diagnose: log EVERY delta attempt so we can see what's happening.
@@ -552,7 +550,7 @@ class AlphaHubChannel(TrackSpecificParser):
         # JSON string inside the already-parsed delta payload. Parse it out.
         if isinstance(comps, str):
             try:
-                comps = json.loads(comps)
+                comps = _json_loads(comps)
             except (TypeError, ValueError):
                 comps = []
         if not isinstance(comps, list):
@@ -569,7 +567,7 @@ class AlphaHubChannel(TrackSpecificParser):
             # Individual competitors can also arrive as JSON strings.
             if isinstance(c, str):
                 try:
-                    c = json.loads(c)
+                    c = _json_loads(c)
                 except (TypeError, ValueError):
                     continue
             if not isinstance(c, dict):
@@ -592,33 +590,27 @@ class AlphaHubChannel(TrackSpecificParser):
         return changed
 
     def _ingest_current_state(self) -> None:
-        df = self.get_current_standings()
-        if df.empty:
+        teams = self.get_current_standings()
+        if not teams:
             self.logger.info(
                 f"Track {self.track_id}: ingest skipped — standings empty"
             )
             return
-        leader_gap = ''
-        if 'Position' in df.columns and 'Gap' in df.columns:
-            leader_row = df[df['Position'].astype(str) == '1']
-            if not leader_row.empty:
-                leader_gap = leader_row.iloc[0].get('Gap', '')
-        session_id = self.check_and_update_session(leader_gap)
+        session_id = self.check_and_update_session(self.leader_gap(teams))
         if session_id is None:
             session_id = self.create_new_session()
             self.current_session_id = session_id
             self.current_leader_lap = 1
             self.session_ended = False
         self.session_active_status = True
-        self.last_data_time = datetime.now()
-        self.store_lap_data(session_id, df)
+        self.store_lap_data(session_id, teams)  # also stamps last_data_time
 
     # ----- event dispatch from the hub ---------------------------------
     async def on_event(self, event: str, data: Dict[str, Any]) -> None:
         """Called by AlphaHubHub when an envelope arrives on this channel."""
         if event == 'update':
             if self._apply_delta(data):
-                await asyncio.to_thread(self._ingest_current_state)
+                await self.run_db(self._ingest_current_state)
             else:
                 self.logger.info(
                     f"Track {self.track_id}: update event ignored (delta unchanged)"
@@ -655,16 +647,9 @@ class AlphaHubChannel(TrackSpecificParser):
         complete the await and the task would end — so we sleep forever
         instead, holding the task slot for bookkeeping. Cancellation
         propagates normally via cleanup."""
-        # Spin up the session monitor thread (same as the parent does) so the
+        # Start the session monitor (same as the parent does) so the
         # session_status events still fire when data goes stale.
-        if self.monitor_thread is None or not self.monitor_thread.is_alive():
-            self.monitor_stop_event.clear()
-            self.monitor_thread = threading.Thread(
-                target=self.start_session_monitoring,
-                name=f"SessionMonitor-Track{self.track_id}",
-                daemon=True,
-            )
-            self.monitor_thread.start()
+        self.start_session_monitoring()
         try:
             while True:
                 await asyncio.sleep(3600)
@@ -672,15 +657,10 @@ class AlphaHubChannel(TrackSpecificParser):
             raise
 
     async def cleanup(self) -> None:
-        if self.monitor_thread and self.monitor_thread.is_alive():
-            self.monitor_stop_event.set()
-            self.monitor_thread.join(timeout=5)
+        await self.stop_session_monitoring()
         if self.hub is not None:
             self.hub.unregister(self.track_id)
+        # Unregistered first so the hub can't start another ingest meanwhile
+        await self.wait_for_db_calls()
         # Don't close any websocket — that's the hub's job.
-
-
-# Keep the local import here, after class definition, to avoid a circular
-# import when alphahub_parser pulls TrackSpecificParser back through this
-# file in some test harnesses.
-import threading  # noqa: E402
+        self.close()
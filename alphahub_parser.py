@@ -13,7 +13,7 @@ The track's data flow:
                          new_session reset state + re-fetch snapshot
 
 Why mirror the Apex flow this closely:
-  - Reuses the per-track DB schema, monitor thread, session-id rollover, and
+  - Reuses the per-track DB schema, session monitor, session-id rollover, and
     the Socket.IO `track_update`/team-room broadcasts already implemented in
     TrackSpecificParser. We only need to keep `self.grid_data` populated like
     a parsed Apex tick, and the parent's `start_monitoring` -> `store_lap_data`
@@ -47,15 +47,22 @@ import ssl
 import threading
 import time
 import urllib.parse
-from datetime import datetime
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
-import pandas as pd
 import requests
 import websockets
 
 from multi_track_manager import TrackSpecificParser
 
+try:
+    # Optional: every Pusher frame is JSON, often two or three layers deep,
+    # so decoding is the bulk of the per-event CPU. stdlib json otherwise.
+    import orjson
+except ImportError:  # pragma: no cover - depends on the install
+    orjson = None
+
+_json_loads = orjson.loads if orjson is not None else json.loads
+
 
 # Process-wide rate limiter for alpharacehub.com HTTP requests.
 #
@@ -339,7 +346,7 @@ class AlphaHubParser(TrackSpecificParser):
     """Per-track parser feeding from alpharacehub.com's Pusher channel.
 
     Reuses TrackSpecificParser's DB plumbing (per-track db, session id rollover,
-    monitor thread, Socket.IO broadcasts). Only the message ingress loop is
+    session monitor, Socket.IO broadcasts). Only the message ingress loop is
     AlphaHub-specific.
     """
 
@@ -507,8 +514,8 @@ class AlphaHubParser(TrackSpecificParser):
             self.last_sequence = seq
         return changed
 
-    # ---- DataFrame construction --------------------------------------------------
-    def get_current_standings(self) -> pd.DataFrame:
+    # ---- Standings construction --------------------------------------------------
+    def get_current_standings(self) -> List[Dict[str, str]]:
         """Build the same shape Apex's parent produces (sorted by Position).
 
         We re-derive it from self.competitors instead of self.grid_data so that
@@ -554,7 +561,7 @@ class AlphaHubParser(TrackSpecificParser):
             except (ValueError, TypeError):
                 return 9999
         rows.sort(key=_pkey)
-        return pd.DataFrame(rows)
+        return rows
 
     # ---- Pusher session ----------------------------------------------------------
     def _auth_subscribe(self, socket_id: str) -> Dict[str, str]:
@@ -605,7 +612,7 @@ class AlphaHubParser(TrackSpecificParser):
                 if env and env.get('event') == 'pusher:connection_established':
                     inner = env.get('data') or {}
                     if isinstance(inner, str):
-                        inner = json.loads(inner)
+                        inner = _json_loads(inner)
                     socket_id = inner.get('socket_id')
             if not socket_id:
                 raise RuntimeError('No pusher:connection_established received')
@@ -629,7 +636,7 @@ class AlphaHubParser(TrackSpecificParser):
 
             # 3) Snapshot first so deltas have somewhere to land
             await asyncio.to_thread(self._fetch_snapshot)
-            await asyncio.to_thread(self._ingest_current_state)
+            await self.run_db(self._ingest_current_state)
 
             # 4) Drain events
             async for raw in ws:
@@ -652,16 +659,16 @@ class AlphaHubParser(TrackSpecificParser):
                 data = env.get('data')
                 if isinstance(data, str):
                     try:
-                        data = json.loads(data)
+                        data = _json_loads(data)
                     except Exception:
                         data = {'raw': data}
                 if ev == 'update':
                     if self._apply_delta(data or {}):
-                        await asyncio.to_thread(self._ingest_current_state)
+                        await self.run_db(self._ingest_current_state)
                 elif ev == 'refresh':
                     self.logger.info(f"Track {self.track_id}: refresh event — refetching snapshot")
                     await asyncio.to_thread(self._fetch_snapshot)
-                    await asyncio.to_thread(self._ingest_current_state)
+                    await self.run_db(self._ingest_current_state)
                 elif ev == 'new_session':
                     self.logger.info(f"Track {self.track_id}: new_session event — resetting")
                     self.competitors = {}
@@ -672,31 +679,26 @@ class AlphaHubParser(TrackSpecificParser):
                     # new session_id rather than appending to the old one.
                     self.session_ended = True
                     await asyncio.to_thread(self._fetch_snapshot)
-                    await asyncio.to_thread(self._ingest_current_state)
+                    await self.run_db(self._ingest_current_state)
 
     def _parse_pusher_envelope(self, raw) -> Optional[Dict[str, Any]]:
         """Pusher messages are JSON envelopes: {event, data, channel?}."""
         if isinstance(raw, bytes):
             raw = raw.decode('utf-8', 'replace')
         try:
-            return json.loads(raw)
+            return _json_loads(raw)
         except Exception:
             self.logger.debug(f"Track {self.track_id}: non-JSON frame ({len(raw)} bytes)")
             return None
 
     def _ingest_current_state(self) -> None:
-        """One Apex-tick-equivalent: build standings DF → session id → store +
-        broadcast. Mirrors the inner `if not df.empty:` block of
+        """One Apex-tick-equivalent: build standings rows → session id → store +
+        broadcast. Mirrors the inner `if teams:` block of
         TrackSpecificParser.start_monitoring."""
-        df = self.get_current_standings()
-        if df.empty:
+        teams = self.get_current_standings()
+        if not teams:
             return
-        leader_gap = ''
-        if 'Position' in df.columns and 'Gap' in df.columns:
-            leader_row = df[df['Position'].astype(str) == '1']
-            if not leader_row.empty:
-                leader_gap = leader_row.iloc[0].get('Gap', '')
-        session_id = self.check_and_update_session(leader_gap)
+        session_id = self.check_and_update_session(self.leader_gap(teams))
         if session_id is None:
             # Mid-session start — open one (same heuristic as Apex parser).
             self.logger.info(
@@ -707,26 +709,17 @@ class AlphaHubParser(TrackSpecificParser):
             self.current_leader_lap = 1
             self.session_ended = False
         self.session_active_status = True
-        self.last_data_time = datetime.now()
-        self.store_lap_data(session_id, df)
+        self.store_lap_data(session_id, teams)  # also stamps last_data_time
 
     # ---- public entrypoint -------------------------------------------------------
     async def start_monitoring(self, ws_url: str) -> None:
         """`ws_url` here is actually the live PAGE URL (alpharacehub.com/<site>/live).
         We scrape it for the Pusher config, then run the pusher loop with retries.
         """
-        # Spin up the same session monitor thread the Apex parser uses.
-        import threading
-        if self.monitor_thread is None or not self.monitor_thread.is_alive():
-            self.monitor_stop_event.clear()
-            self.monitor_thread = threading.Thread(
-                target=self.start_session_monitoring,
-                name=f"SessionMonitor-Track{self.track_id}",
-                daemon=True,
-            )
-            self.monitor_thread.start()
+        # Start the same session monitor the Apex parser uses.
+        if self.start_session_monitoring():
             self.logger.info(
-                f"Started session monitoring thread for track {self.track_id} "
+                f"Started session monitoring for track {self.track_id} "
                 f"({self.track_name}) [AlphaHub]"
             )
 
@@ -5,34 +5,177 @@ import os
 import sqlite3
 import time
 import traceback
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional, Dict, List, Tuple
+from operator import attrgetter
+from typing import Optional, Dict, List, Set, Tuple
 import pandas as pd
 import websockets
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import re
 
+try:
+    # Optional: libuv-backed event loop. The parsers spend nearly all their
+    # time in `async for message in websocket`, which is exactly the socket
+    # dispatch uvloop speeds up. Falls back to the stdlib loop when absent.
+    import uvloop
+except ImportError:  # pragma: no cover - depends on the install
+    uvloop = None
+
 
 # Pre-compile hot-path regexes so they aren't built inside the WebSocket
 # message loop (which fires many times per second per track).
 _LAPTIME_RE = re.compile(r'^\d{1,2}:\d{2}\.\d{3}$')
 
+# Commands whose value is simply recorded in session_info, and under which
+# key. Shared with TrackSpecificParser.
+SESSION_INFO_COMMANDS = {
+    'title1': 'title1',
+    'title2': 'title2',
+    'com': 'comment',
+    'msg': 'message',
+    'track': 'track',
+}
+
+# store_lap_data's inserts, shared with TrackSpecificParser. Fixed strings so
+# the connection's statement cache hits on every tick instead of re-preparing.
+SQL_INSERT_LAP_TIMES = (
+    'INSERT INTO lap_times (session_id, timestamp, position, kart_number, team_name, '
+    'last_lap, best_lap, gap, RunTime, pit_stops) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'
+)
+SQL_INSERT_LAP_HISTORY = (
+    'INSERT INTO lap_history (session_id, timestamp, kart_number, team_name, '
+    'lap_number, lap_time, position_after_lap, pit_this_lap) VALUES (?, ?, ?, ?, ?, ?, ?, ?)'
+)
+SQL_INSERT_SESSION = 'INSERT INTO race_sessions (start_time, name, track) VALUES (?, ?, ?)'
+
+# process_init_message only reads the grid's header row.
+_HEAD_ROW = SoupStrainer('tr', class_='head')
+
+# Apex status CSS codes -> display status. Insertion order is the match
+# priority for process_css_message, which tests codes as substrings.
+_STATUS_MAP = {
+    'si': 'Pit-in',
+    'so': 'Pit-out',
+    'sf': 'Finished',
+    'ss': 'Stopped',
+    'su': 'Up',
+    'sd': 'Down',
+    'sr': 'On Track',
+}
+
+
+def _position_rank(position: str) -> int:
+    """Sort key for a Position cell; rows without a numeric position go last."""
+    return int(position) if position.isdigit() else 999
+
+
+def runtime_to_seconds(runtime: str) -> int:
+    """RunTime cell ('MM:SS' or plain seconds) as whole seconds; '' is 0."""
+    minutes, sep, rest = runtime.partition(':')
+    if sep:
+        # Anything after a second ':' is ignored, as before
+        return int(minutes) * 60 + int(rest.partition(':')[0])
+    return int(runtime) if runtime.strip() else 0
+
+
+def pit_stops_count(pit_stops: str) -> int:
+    """Pit Stops cell as a count. Some feeds put the pit *time* ('00:22')
+    in that column instead; that, like anything non-numeric, counts as 0."""
+    pit_stops = pit_stops.strip()
+    return int(pit_stops) if pit_stops.isdigit() else 0
+
+
+@dataclass(slots=True)
+class RowState:
+    """One grid row (kart) as the standings see it."""
+    status: str = 'On Track'
+    position: str = ''
+    kart: str = ''
+    team: str = ''
+    last_lap: str = ''
+    best_lap: str = ''
+    gap: str = ''
+    runtime: str = ''
+    pit_stops: str = '0'
+    # _position_rank(position), kept in step by _set_cell so sorting the
+    # standings doesn't re-parse every Position string.
+    pos_int: int = field(default=999, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.pos_int = _position_rank(self.position)
+
+
+# Grid column name -> RowState slot. Columns not listed here (Interval,
+# Total Laps, extra custom mappings) are never surfaced, so they aren't kept.
+_FIELD_ATTR = {
+    'Status': 'status',
+    'Position': 'position',
+    'Kart': 'kart',
+    'Team': 'team',
+    'Last Lap': 'last_lap',
+    'Best Lap': 'best_lap',
+    'Gap': 'gap',
+    'RunTime': 'runtime',
+    'Pit Stops': 'pit_stops',
+}
+
+
+def new_event_loop() -> asyncio.AbstractEventLoop:
+    """Create the event loop the WebSocket readers run on (uvloop if installed)."""
+    if uvloop is not None:
+        return uvloop.new_event_loop()
+    return asyncio.new_event_loop()
+
 
 class ApexTimingWebSocketParser:
     """WebSocket-based parser for Apex Timing live data"""
+
+    # Cells whose change can mean a completed lap; only these trigger a write.
+    FLUSH_FIELDS = frozenset({'Last Lap', 'RunTime'})
+    # Seconds to coalesce cell updates before writing the standings.
+    FLUSH_INTERVAL = 0.25
+    # Most queued frames handled per processor pass.
+    MESSAGE_BATCH_SIZE = 128
     
     def __init__(self):
         self.setup_logging()
-        self.setup_database()
+        # Opened by get_db_connection on the first write
+        self.db: Optional[sqlite3.Connection] = None
         self.websocket = None
         self.last_data_hash = None
-        self.grid_data = {}  # Store grid data by row/column
+        self.grid_data: Dict[str, RowState] = {}  # Store grid data by row ID
         self.row_map = {}  # Map row IDs to kart numbers
         self.column_map = {}  # Map column indices to field names
         self.custom_column_map = None  # Custom column mappings from track config
         self.data_type_column_map = {}  # Map column indices based on data-type attributes
         self.session_info = {}
         self.is_connected = False
+        self.session_id = None
+        self.message_count = 0
+        # Command -> handler(parameter, value), used by process_message
+        self._command_handlers = {
+            'init': self.process_init_message,
+            'grid': self.process_grid_message,
+            'update': self.process_update_message,
+            'css': self.process_css_message,
+            'title': self.process_title_message,
+            'clear': self.process_clear_message,
+        }
+        self.dirty_rows: Set[str] = set()  # Rows changed since the last flush
+        self.lap_data_dirty = False  # A FLUSH_FIELDS cell changed since the last flush
+        self._flush_handle = None  # Pending loop.call_later() flush
+        # get_current_standings() result, reused until a grid cell changes
+        self._standings_dirty = True
+        self._standings_cache: List[Dict[str, str]] = []
+        # get_current_data() DataFrame and the standings list it was built from
+        self._standings_df: Optional[pd.DataFrame] = None
+        self._standings_df_source: Optional[List[Dict[str, str]]] = None
+        # kart -> (RunTime, last_lap, position, best_lap, pit_stops) as last
+        # seen by store_lap_data, for the session in _prev_kart_session;
+        # seeded from the DB once per session
+        self._prev_kart_state: Dict[int, tuple] = {}
+        self._prev_kart_session: Optional[int] = None
 
         # Standard data-type to field name mapping
         self.DATA_TYPE_MAP = {
@@ -74,50 +217,78 @@ class ApexTimingWebSocketParser:
         )
         self.logger = logging.getLogger(__name__)
         
-    def setup_database(self):
-        """Initialize the SQLite database with required tables"""
+    def get_db_connection(self) -> sqlite3.Connection:
+        """Return the race_data.db connection, opening it on first use.
+
+        One connection for the parser's lifetime, in autocommit mode;
+        store_lap_data wraps each write burst in its own transaction.
+        Parsers that never write (e.g. in unit tests) never open the file.
+        """
+        if self.db is None:
+            conn = sqlite3.connect('race_data.db', isolation_level=None, cached_statements=256)
+            try:
+                self.setup_database(conn)
+            except Exception:
+                conn.close()
+                raise
+            self.db = conn
+        return self.db
+
+    def setup_database(self, conn: sqlite3.Connection):
+        """Create the required tables on a new race_data.db connection"""
         try:
-            with sqlite3.connect('race_data.db') as conn:
-                conn.execute('''
-                    CREATE TABLE IF NOT EXISTS race_sessions (
-                        session_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        start_time TEXT,
-                        name TEXT,
-                        track TEXT
-                    )
-                ''')
-                
-                conn.execute('''
-                    CREATE TABLE IF NOT EXISTS lap_times (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        session_id INTEGER,
-                        timestamp TEXT,
-                        position INTEGER,
-                        kart_number INTEGER,
-                        team_name TEXT,
-                        last_lap TEXT,
-                        best_lap TEXT,
-                        gap TEXT,
-                        RunTime TEXT,
-                        pit_stops INTEGER,
-                        FOREIGN KEY (session_id) REFERENCES race_sessions(session_id)
-                    )
-                ''')
-
-                conn.execute('''
-                    CREATE TABLE IF NOT EXISTS lap_history (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        session_id INTEGER,
-                        timestamp TEXT,
-                        kart_number INTEGER,
-                        team_name TEXT,
-                        lap_number INTEGER,
-                        lap_time TEXT,
-                        position_after_lap INTEGER,
-                        pit_this_lap INTEGER,
-                        FOREIGN KEY (session_id) REFERENCES race_sessions(session_id)
-                    )
-                ''')
+            # WAL lets the UI read standings while a lap burst is being written
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS race_sessions (
+                    session_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    start_time TEXT,
+                    name TEXT,
+                    track TEXT
+                )
+            ''')
+            
+            # Append-only: rowid keys without AUTOINCREMENT's sqlite_sequence
+            # write. RunTime is whole seconds, stored as an int.
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS lap_times (
+                    id INTEGER PRIMARY KEY,
+                    session_id INTEGER,
+                    timestamp TEXT,
+                    position INTEGER,
+                    kart_number INTEGER,
+                    team_name TEXT,
+                    last_lap TEXT,
+                    best_lap TEXT,
+                    gap TEXT,
+                    RunTime INTEGER,
+                    pit_stops INTEGER,
+                    FOREIGN KEY (session_id) REFERENCES race_sessions(session_id)
+                )
+            ''')
+
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS lap_history (
+                    id INTEGER PRIMARY KEY,
+                    session_id INTEGER,
+                    timestamp TEXT,
+                    kart_number INTEGER,
+                    team_name TEXT,
+                    lap_number INTEGER,
+                    lap_time TEXT,
+                    position_after_lap INTEGER,
+                    pit_this_lap INTEGER,
+                    FOREIGN KEY (session_id) REFERENCES race_sessions(session_id)
+                )
+            ''')
+
+            # store_lap_data looks up each kart's latest row in a session
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_lap_times_session_kart_ts
+                ON lap_times(session_id, kart_number, timestamp DESC)
+            ''')
             self.logger.debug("Database setup complete")
         except Exception as e:
             self.logger.error(f"Database setup error: {e}")
@@ -150,32 +321,43 @@ class ApexTimingWebSocketParser:
         }
         return mapping.get(field, field)
             
-    def parse_websocket_message(self, message: str) -> Dict:
-        """Parse a WebSocket message in the format: command|parameter|value"""
+    @staticmethod
+    def parse_websocket_message(message: str) -> Optional[Tuple[str, str, str]]:
+        """Parse a WebSocket message in the format: command|parameter|value
+
+        Returns a (command, parameter, value) tuple, or None when the line
+        has no separator. A tuple rather than a dict because this runs for
+        every line of every frame.
+        """
         parts = message.split('|', 2)
         if len(parts) < 2:
-            return {}
-            
-        command = parts[0]
-        parameter = parts[1] if len(parts) > 1 else ""
-        value = parts[2] if len(parts) > 2 else ""
-        
-        return {
-            'command': command,
-            'parameter': parameter,
-            'value': value
-        }
+            return None
+        if len(parts) == 2:
+            return parts[0], parts[1], ''
+        return parts[0], parts[1], parts[2]
         
-    def process_init_message(self, data: Dict):
+    def _set_cell(self, row_id: str, field: str, value: str) -> None:
+        """Write one grid cell, marking the row dirty if the value changed"""
+        row = self.grid_data.get(row_id)
+        if row is None:
+            row = self.grid_data[row_id] = RowState()
+        attr = _FIELD_ATTR.get(field)
+        if attr is not None and getattr(row, attr) != value:
+            setattr(row, attr, value)
+            if attr == 'position':
+                row.pos_int = _position_rank(value)
+            self._standings_dirty = True
+            self.dirty_rows.add(row_id)
+            if field in self.FLUSH_FIELDS:
+                self.lap_data_dirty = True
+
+    def process_init_message(self, parameter: str, value: str):
         """Process initialization messages"""
-        parameter = data['parameter']
-        value = data['value']
-        
         if parameter == 'grid':
-            # Grid initialization contains HTML table structure
-            # Parse the HTML to extract column mappings
-            from bs4 import BeautifulSoup
-            soup = BeautifulSoup(value, 'html.parser')
+            # Grid initialization contains HTML table structure. Only the
+            # header row is needed for the column mappings, so only it is
+            # built into a tree.
+            soup = BeautifulSoup(value, 'html.parser', parse_only=_HEAD_ROW)
             
             # Find header row
             header_row = soup.find('tr', {'class': 'head'})
@@ -207,57 +389,25 @@ class ApexTimingWebSocketParser:
                         
                 self.logger.debug(f"Column map initialized: {self.column_map}")
                 
-            # Also process any initial grid data rows
-            data_rows = soup.find_all('tr', {'data-id': True})
-            for row in data_rows:
-                if row.get('class') and 'head' in row.get('class'):
-                    continue
-                    
-                row_id = row.get('data-id')
-                if row_id:
-                    self.grid_data[row_id] = {}
-                    cells = row.find_all('td')
-                    
-                    for i, cell in enumerate(cells):
-                        # Use custom column map if available, otherwise use auto-detected map
-                        if self.custom_column_map and i in self.custom_column_map:
-                            field = self.custom_column_map[i]
-                        elif i in self.column_map:
-                            field = self.column_map[i]
-                        else:
-                            continue
-
-                            # Special handling for different cell types
-                            if field == 'Kart':
-                                # Kart number might be in a div
-                                div = cell.find('div')
-                                value = div.text.strip() if div else cell.text.strip()
-                            elif field == 'Position':
-                                # Position might be in a p tag
-                                p = cell.find('p')
-                                value = p.text.strip() if p else cell.text.strip()
-                            else:
-                                value = cell.text.strip()
-                                
-                            self.grid_data[row_id][field] = value
-                            
-                            # Store kart mapping
-                            if field == 'Kart' and value:
-                                self.row_map[row_id] = value
-                                
-            self.logger.debug(f"Grid initialized with {len(self.grid_data)} rows")
+            # The row cells in this HTML were never read (and every value is
+            # re-sent as grid/update messages), so start the grid empty and
+            # let those messages fill it.
+            self.grid_data.clear()
+            self._standings_dirty = True
+            self.row_map.clear()
                         
-    def process_grid_message(self, data: Dict):
+    def process_grid_message(self, parameter: str, value: str):
         """Process grid data messages"""
         # The grid message contains the entire HTML table
-        if data['parameter'] == '' and data['value']:
+        if parameter == '' and value:
             # This is the full grid HTML
             self.logger.debug("Processing full grid HTML")
             from bs4 import BeautifulSoup
-            soup = BeautifulSoup(data['value'], 'html.parser')
+            soup = BeautifulSoup(value, 'html.parser')
             
             # Clear existing data
             self.grid_data.clear()
+            self._standings_dirty = True
             self.row_map.clear()
             self.column_map.clear()
             self.data_type_column_map.clear()
@@ -317,7 +467,7 @@ class ApexTimingWebSocketParser:
 
                 row_id = row.get('data-id')
                 if row_id:
-                    self.grid_data[row_id] = {}
+                    self.grid_data[row_id] = RowState()
                     cells = row.find_all('td')
 
                     for i, cell in enumerate(cells):
@@ -354,7 +504,7 @@ class ApexTimingWebSocketParser:
                         else:
                             value = cell.text.strip()
 
-                        self.grid_data[row_id][field] = value
+                        self._set_cell(row_id, field, value)
 
                         # Store kart mapping
                         if field == 'Kart' and value:
@@ -363,13 +513,14 @@ class ApexTimingWebSocketParser:
             self.logger.debug(f"Grid initialized with {len(self.grid_data)} rows")
         else:
             # This might be a row update
-            row_id = data['parameter']
-            values = data['value'].split('|')
+            row_id = parameter
+            values = value.split('|')
 
-            self.logger.debug(f"Processing grid row update for row {row_id}, {len(values)} values")
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(f"Processing grid row update for row {row_id}, {len(values)} values")
 
             if row_id not in self.grid_data:
-                self.grid_data[row_id] = {}
+                self.grid_data[row_id] = RowState()
 
             # Update grid data for this row
             for i, value in enumerate(values):
@@ -383,18 +534,18 @@ class ApexTimingWebSocketParser:
                 else:
                     continue
 
-                self.grid_data[row_id][field] = value.strip()
+                self._set_cell(row_id, field, value.strip())
 
                 # If this is the kart number column, store the mapping
                 if field == 'Kart' and value.strip():
                     self.row_map[row_id] = value.strip()
                     
-    def process_update_message(self, data: Dict):
+    def process_update_message(self, cell_id: str, payload: str):
         """Process cell update messages"""
         # Update messages have format: cellId|classOrType|value
         # Example: r900005625c1|su| or r900005625c2||13
-        parts = data['value'].split('|')
-        cell_id = data['parameter']
+        debug = self.logger.isEnabledFor(logging.DEBUG)
+        parts = payload.split('|')
 
         # The actual value is the last part (could be empty)
         value = parts[1] if len(parts) > 1 else ''
@@ -402,19 +553,22 @@ class ApexTimingWebSocketParser:
         # Parse cell ID (format: r{row}c{col})
         match = re.match(r'r(\d+)c(\d+)', cell_id)
         if not match:
-            self.logger.debug(f"Could not parse cell ID: {cell_id}")
+            if debug:
+                self.logger.debug(f"Could not parse cell ID: {cell_id}")
             return
 
         row_id = f"r{match.group(1)}"
         col_idx = int(match.group(2)) - 1  # Column index is 1-based, convert to 0-based
 
         # Log incoming update for debugging
-        self.logger.debug(f"Cell update: {row_id} col={col_idx} (1-based={match.group(2)}) value='{value}' parts={parts}")
+        if debug:
+            self.logger.debug(f"Cell update: {row_id} col={col_idx} (1-based={match.group(2)}) value='{value}' parts={parts}")
 
         # Initialize row if needed
         if row_id not in self.grid_data:
-            self.grid_data[row_id] = {}
-            self.logger.debug(f"Created new row: {row_id}")
+            self.grid_data[row_id] = RowState()
+            if debug:
+                self.logger.debug(f"Created new row: {row_id}")
 
         # Update the specific cell
         # Priority order: data-type map > custom map > text-based map
@@ -423,46 +577,40 @@ class ApexTimingWebSocketParser:
 
         if col_idx in self.data_type_column_map:
             field = self.data_type_column_map[col_idx]
-            self.grid_data[row_id][field] = value.strip()
-            self.logger.debug(f"Updated via data-type map: {row_id}[{field}] = '{value}'")
+            self._set_cell(row_id, field, value.strip())
+            if debug:
+                self.logger.debug(f"Updated via data-type map: {row_id}[{field}] = '{value}'")
             updated = True
         elif self.custom_column_map and col_idx in self.custom_column_map:
             field = self.custom_column_map[col_idx]
-            self.grid_data[row_id][field] = value.strip()
-            self.logger.debug(f"Updated via custom map: {row_id}[{field}] = '{value}'")
+            self._set_cell(row_id, field, value.strip())
+            if debug:
+                self.logger.debug(f"Updated via custom map: {row_id}[{field}] = '{value}'")
             updated = True
         elif col_idx in self.column_map:
             field = self.column_map[col_idx]
-            self.grid_data[row_id][field] = value.strip()
-            self.logger.debug(f"Updated via text-based map: {row_id}[{field}] = '{value}'")
+            self._set_cell(row_id, field, value.strip())
+            if debug:
+                self.logger.debug(f"Updated via text-based map: {row_id}[{field}] = '{value}'")
             updated = True
 
         if updated and field:
             # Special handling for status updates (check CSS class in parts[0])
             if field == 'Status' and len(parts) > 0:
-                status_class = parts[0]
-                if status_class == 'si':
-                    self.grid_data[row_id]['Status'] = 'Pit-in'
-                elif status_class == 'so':
-                    self.grid_data[row_id]['Status'] = 'Pit-out'
-                elif status_class == 'su':
-                    self.grid_data[row_id]['Status'] = 'Up'
-                elif status_class == 'sd':
-                    self.grid_data[row_id]['Status'] = 'Down'
-                elif status_class == 'sr':
-                    self.grid_data[row_id]['Status'] = 'On Track'
+                status = _STATUS_MAP.get(parts[0])
+                if status:
+                    self._set_cell(row_id, 'Status', status)
 
             # Update kart mapping if this is a kart number
             if field == 'Kart' and value.strip():
                 self.row_map[row_id] = value.strip()
 
         if not updated:
-            self.logger.debug(f"Column {col_idx} not in any column maps (data-type: {list(self.data_type_column_map.keys())}, custom: {list(self.custom_column_map.keys()) if self.custom_column_map else 'None'}, text: {list(self.column_map.keys())})")
+            if debug:
+                self.logger.debug(f"Column {col_idx} not in any column maps (data-type: {list(self.data_type_column_map.keys())}, custom: {list(self.custom_column_map.keys()) if self.custom_column_map else 'None'}, text: {list(self.column_map.keys())})")
                 
-    def process_css_message(self, data: Dict):
+    def process_css_message(self, cell_id: str, css_class: str):
         """Process CSS class update messages (used for status indicators)"""
-        cell_id = data['parameter']
-        css_class = data['value']
         
         # Parse cell ID
         match = re.match(r'r(\d+)c(\d+)', cell_id)
@@ -472,168 +620,209 @@ class ApexTimingWebSocketParser:
         row_id = f"r{match.group(1)}"
         
         # Check if this is a status column (usually column 0 or 1)
-        if 'si' in css_class:
-            status = 'Pit-in'
-        elif 'so' in css_class:
-            status = 'Pit-out'
-        elif 'sf' in css_class:
-            status = 'Finished'
-        elif 'ss' in css_class:
-            status = 'Stopped'
-        elif 'su' in css_class:
-            status = 'Up'
-        elif 'sd' in css_class:
-            status = 'Down'
-        else:
-            status = 'On Track'
+        status = next(
+            (name for code, name in _STATUS_MAP.items() if code in css_class),
+            'On Track'
+        )
             
         if row_id not in self.grid_data:
-            self.grid_data[row_id] = {}
-        self.grid_data[row_id]['Status'] = status
+            self.grid_data[row_id] = RowState()
+        self._set_cell(row_id, 'Status', status)
         
-    def process_title_message(self, data: Dict):
+    def process_clear_message(self, parameter: str, value: str):
+        """Process clear messages (only the grid is ever cleared)"""
+        if parameter == 'grid':
+            self.grid_data.clear()
+            self._standings_dirty = True
+            self.row_map.clear()
+
+    def process_title_message(self, parameter: str, title: str):
         """Process title messages (session info)"""
-        title = data['value']
         self.session_info['title'] = title
         self.logger.debug(f"Session title: {title}")
         
-    def get_current_standings(self) -> pd.DataFrame:
-        """Convert current grid data to DataFrame format compatible with existing code"""
+    def get_current_standings(self) -> List[Dict[str, str]]:
+        """Convert current grid data to a list of row dicts sorted by position.
+
+        Kept as plain dicts rather than a DataFrame: this runs once per
+        WebSocket message and the rows are only ever walked one by one, so
+        building a DataFrame just to iterrows() it cost more than the writes.
+
+        The list is cached and returned as-is until a grid cell changes;
+        callers must treat it as read-only.
+        """
+        if not self._standings_dirty:
+            return self._standings_cache
+        # Clear before building: a write landing mid-build (join_track reads
+        # from a Flask thread) re-dirties the cache rather than being lost.
+        self._standings_dirty = False
+
+        debug = self.logger.isEnabledFor(logging.DEBUG)
         teams = []
         
-        self.logger.debug(f"get_current_standings: grid_data has {len(self.grid_data)} rows")
+        if debug:
+            self.logger.debug(f"get_current_standings: grid_data has {len(self.grid_data)} rows")
         
-        for row_id, row_data in self.grid_data.items():
-            if 'Kart' in row_data and row_data['Kart']:
-                team_name = row_data.get('Team', '')
-
-                # Validate team name - warn if it looks like a lap time
-                if team_name and ':' in team_name and '.' in team_name:
-                    if _LAPTIME_RE.match(team_name):
-                        self.logger.warning(f"Team name looks like lap time for kart {row_data.get('Kart', '')}: '{team_name}' - possible column mapping issue")
-
-                team_data = {
-                    'Status': row_data.get('Status', 'On Track'),
-                    'Position': row_data.get('Position', ''),
-                    'Kart': row_data.get('Kart', ''),
-                    'Team': team_name,
-                    'Last Lap': row_data.get('Last Lap', ''),
-                    'Best Lap': row_data.get('Best Lap', ''),
-                    'Gap': row_data.get('Gap', ''),
-                    'RunTime': row_data.get('RunTime', ''),
-                    'Pit Stops': row_data.get('Pit Stops', '0')
-                }
-                teams.append(team_data)
+        # Sort by position (pre-parsed on write), then build the dicts
+        rows = sorted(
+            (row for row in self.grid_data.values() if row.kart),
+            key=attrgetter('pos_int')
+        )
+        for row in rows:
+            team_name = row.team
+
+            # Validate team name - warn if it looks like a lap time
+            if team_name and ':' in team_name and '.' in team_name:
+                if _LAPTIME_RE.match(team_name):
+                    self.logger.warning(f"Team name looks like lap time for kart {row.kart}: '{team_name}' - possible column mapping issue")
+
+            team_data = {
+                'Status': row.status,
+                'Position': row.position,
+                'Kart': row.kart,
+                'Team': team_name,
+                'Last Lap': row.last_lap,
+                'Best Lap': row.best_lap,
+                'Gap': row.gap,
+                'RunTime': row.runtime,
+                'Pit Stops': row.pit_stops
+            }
+            teams.append(team_data)
                 
-        # Sort by position
-        teams.sort(key=lambda x: int(x['Position']) if x['Position'].isdigit() else 999)
-        
-        self.logger.debug(f"Returning {len(teams)} teams from get_current_standings")
-        if teams:
+        if debug:
+            self.logger.debug(f"Returning {len(teams)} teams from get_current_standings")
+        if debug and teams:
             self.logger.debug(f"First team: {teams[0]}")
         
-        return pd.DataFrame(teams)
+        self._standings_cache = teams
+        return teams
         
-    def store_lap_data(self, session_id: int, df: pd.DataFrame):
+    def store_lap_data(self, session_id: int, teams: List[Dict[str, str]]):
         """Store lap timing data in database (reuse from Playwright parser)"""
-        if df.empty:
+        if not teams:
             return
 
         timestamp = datetime.now().isoformat()
-        current_records = []
         lap_history_records = []
         
-        try:
-            with sqlite3.connect('race_data.db') as conn:
-                previous_state = pd.read_sql_query('''
-                    SELECT kart_number, RunTime, last_lap, best_lap, pit_stops
-                    FROM lap_times 
-                    WHERE session_id = ? 
-                    ORDER BY timestamp DESC
-                ''', conn, params=(session_id,))
-        except Exception:
-            previous_state = pd.DataFrame()
-        
-        for _, row in df.iterrows():
+        # Latest (RunTime, last_lap, position, best_lap, pit_stops) per kart.
+        # Kept in memory and updated as
+        # rows are written; the DB is only read when a session is first seen
+        # (e.g. after a restart). SQLite takes the bare columns from the
+        # MAX(timestamp) row, so that seed is one indexed pass.
+        if self._prev_kart_session != session_id:
+            self._prev_kart_state = {}
+            self._prev_kart_session = session_id
             try:
-                position = int(row['Position']) if row.get('Position', '').strip() else None
-                kart = int(row['Kart']) if row.get('Kart', '').strip() else None
-                # Parse RunTime from MM:SS format to seconds
-                runtime_str = row.get('RunTime', '0')
-                if ':' in runtime_str:
-                    parts = runtime_str.split(':')
-                    runtime = int(parts[0]) * 60 + int(parts[1])
-                else:
-                    runtime = int(runtime_str) if runtime_str.strip() else 0
-                
-                current_records.append((
+                for kart_number, _, *state in self.get_db_connection().execute('''
+                    SELECT kart_number, MAX(timestamp), CAST(RunTime AS INTEGER), last_lap,
+                           position, best_lap, pit_stops
+                    FROM lap_times
+                    WHERE session_id = ?
+                    GROUP BY kart_number
+                ''', (session_id,)):
+                    self._prev_kart_state[kart_number] = tuple(state)
+            except sqlite3.Error as e:
+                self.logger.warning(f"Could not seed previous kart state: {e}")
+        previous_state = self._prev_kart_state
+        # Only committed once the rows below are; a failed write keeps the
+        # old state so the same laps are detected again on the next tick
+        new_state = {}
+        
+        def lap_time_records():
+            # Yields lap_times rows straight into executemany; the (rare) new
+            # laps are collected on the side for lap_history. A kart whose
+            # position, laps and pit count are unchanged since its last row
+            # is skipped: gap/RunTime drift alone isn't worth a row.
+            for row in teams:
+                try:
+                    position = int(row['Position']) if row.get('Position', '').strip() else None
+                    kart = int(row['Kart']) if row.get('Kart', '').strip() else None
+                    runtime = runtime_to_seconds(row.get('RunTime', '0'))
+                    pit_stops = int(row.get('Pit Stops', '0'))
+                except Exception as e:
+                    self.logger.warning(f"Error processing row {row}: {e}")
+                    continue
+
+                team = row.get('Team', '')
+                current_last_lap = row.get('Last Lap', '')
+                best_lap = row.get('Best Lap', '')
+                state = (runtime, current_last_lap, position, best_lap, pit_stops)
+
+                # Check for new laps
+                prev_kart_state = previous_state.get(kart)
+                if prev_kart_state is not None:
+                    prev_runtime, prev_last_lap = prev_kart_state[:2]
+                    if runtime != prev_runtime and current_last_lap and current_last_lap != prev_last_lap:
+                        lap_history_records.append((
+                            session_id,
+                            timestamp,
+                            kart,
+                            team,
+                            runtime,
+                            current_last_lap,
+                            position,
+                            pit_stops
+                        ))
+                new_state[kart] = state
+                if prev_kart_state is not None and prev_kart_state[1:] == state[1:]:
+                    continue
+
+                yield (
                     session_id,
                     timestamp,
                     position,
                     kart,
-                    row.get('Team', ''),
-                    row.get('Last Lap', ''),
-                    row.get('Best Lap', ''),
+                    team,
+                    current_last_lap,
+                    best_lap,
                     row.get('Gap', ''),
                     runtime,
-                    int(row.get('Pit Stops', '0'))
-                ))
+                    pit_stops
+                )
 
-                # Check for new laps
-                if not previous_state.empty:
-                    prev_kart_state = previous_state[previous_state['kart_number'] == kart]
-                    if not prev_kart_state.empty:
-                        prev_runtime = prev_kart_state.iloc[0]['RunTime']
-                        prev_last_lap = prev_kart_state.iloc[0]['last_lap']
-                        current_last_lap = row.get('Last Lap', '')
-                        
-                        if runtime != prev_runtime and current_last_lap and current_last_lap != prev_last_lap:
-                            lap_history_records.append((
-                                session_id,
-                                timestamp,
-                                kart,
-                                row.get('Team', ''),
-                                runtime,
-                                current_last_lap,
-                                position,
-                                int(row.get('Pit Stops', '0'))
-                            ))
+        db = self.get_db_connection()
+        try:
+            db.execute('BEGIN')
+            stored = db.executemany(SQL_INSERT_LAP_TIMES, lap_time_records()).rowcount
+            
+            if lap_history_records:
+                db.executemany(SQL_INSERT_LAP_HISTORY, lap_history_records)
+            db.execute('COMMIT')
+            previous_state.update(new_state)
+            
+            self.logger.debug(f"Stored {stored} current records and {len(lap_history_records)} lap history records")
+        except Exception as e:
+            if db.in_transaction:
+                db.rollback()
+            self.logger.error(f"Error storing data in database: {e}")
+                
+    def flush_lap_data(self):
+        """Store the current standings if a lap-relevant cell changed since the last flush"""
+        self._flush_handle = None
+        if not self.lap_data_dirty or self.session_id is None:
+            return
+        self.lap_data_dirty = False
+        self.dirty_rows.clear()
 
-            except Exception as e:
-                self.logger.warning(f"Error processing row {row}: {e}")
-                continue
+        teams = self.get_current_standings()
+        if teams:
+            self.store_lap_data(self.session_id, teams)
+            self.logger.debug(f"Flushed {len(teams)} teams")
+            # Log sample data for debugging
+            first_team = teams[0]
+            self.logger.debug(f"Leader: Pos={first_team.get('Position')}, "
+                           f"Kart={first_team.get('Kart')}, Team={first_team.get('Team')}, "
+                           f"Gap={first_team.get('Gap')}, Status={first_team.get('Status')}")
+        else:
+            self.logger.debug("No team data to flush")
 
-        if current_records:
-            try:
-                with sqlite3.connect('race_data.db') as conn:
-                    conn.executemany('''
-                        INSERT INTO lap_times 
-                        (session_id, timestamp, position, kart_number, team_name,
-                        last_lap, best_lap, gap, RunTime, pit_stops)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', current_records)
-                    
-                    if lap_history_records:
-                        conn.executemany('''
-                            INSERT INTO lap_history 
-                            (session_id, timestamp, kart_number, team_name, 
-                            lap_number, lap_time, position_after_lap, pit_this_lap)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                        ''', lap_history_records)
-                    
-                    self.logger.debug(f"Stored {len(current_records)} current records and {len(lap_history_records)} lap history records")
-            except Exception as e:
-                self.logger.error(f"Error storing data in database: {e}")
-                
     def store_session_data(self, session_name: str, track: str) -> int:
         """Store new session information and return session ID"""
-        with sqlite3.connect('race_data.db') as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO race_sessions (start_time, name, track) VALUES (?, ?, ?)",
-                (datetime.now().isoformat(), session_name, track)
-            )
-            return cursor.lastrowid
+        cursor = self.get_db_connection().execute(
+            SQL_INSERT_SESSION, (datetime.now().isoformat(), session_name, track)
+        )
+        return cursor.lastrowid
             
     async def connect_websocket(self, ws_url: str):
         """Connect to the WebSocket endpoint"""
@@ -652,7 +841,6 @@ class ApexTimingWebSocketParser:
             
             try:
                 # First try with default settings
-                import websockets
                 # Check websockets version and use appropriate parameters
                 if hasattr(websockets, '__version__') and websockets.__version__ >= '10.0':
                     self.websocket = await websockets.connect(
@@ -661,7 +849,7 @@ class ApexTimingWebSocketParser:
                         ping_interval=20,
                         ping_timeout=10,
                         close_timeout=10,
-                        compression="deflate"
+                        compression=None  # frames are tiny pipe-delimited text; deflate costs more CPU than it saves
                     )
                 else:
                     # For older versions, headers go in subprotocol
@@ -695,7 +883,7 @@ class ApexTimingWebSocketParser:
                             ping_interval=20,
                             ping_timeout=10,
                             close_timeout=10,
-                            compression="deflate"
+                            compression=None
                         )
                     else:
                         self.websocket = await websockets.connect(
@@ -731,18 +919,192 @@ class ApexTimingWebSocketParser:
             self.is_connected = False
             return False
             
+    def close(self):
+        """Close the race_data.db connection (safe to call more than once)"""
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    async def cleanup(self):
+        """Disconnect, flushing any pending write, then close the database"""
+        await self.disconnect_websocket()
+        self.close()
+
     async def disconnect_websocket(self):
         """Disconnect from the WebSocket"""
+        if self._flush_handle is not None:
+            # Don't drop a write that is still waiting out the debounce
+            self._flush_handle.cancel()
+            self.flush_lap_data()
         if self.websocket:
             await self.websocket.close()
             self.websocket = None
             self.is_connected = False
             self.logger.debug("WebSocket disconnected")
             
+    async def _read_messages(self, queue: asyncio.Queue):
+        """Move frames from the socket to queue; None marks the end of the connection"""
+        try:
+            async for message in self.websocket:
+                queue.put_nowait(message)
+        finally:
+            queue.put_nowait(None)
+
+    async def _process_messages(self, queue: asyncio.Queue):
+        """Handle queued frames in batches of up to MESSAGE_BATCH_SIZE"""
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.MESSAGE_BATCH_SIZE and not queue.empty():
+                batch.append(queue.get_nowait())
+            ended = batch[-1] is None
+            if ended:
+                batch.pop()
+
+            for message in batch:
+                self.process_message(message)
+            self._schedule_flush()
+
+            if ended:
+                return
+            # Let the reader drain the socket before the next batch
+            await asyncio.sleep(0)
+
+    def _schedule_flush(self):
+        """Arrange a flush_lap_data() call if a lap-relevant cell changed"""
+        # Most messages are status/CSS churn; only schedule a write once a
+        # lap-relevant cell changed, and coalesce everything arriving in the
+        # next FLUSH_INTERVAL into that one write.
+        if self.lap_data_dirty and self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(
+                self.FLUSH_INTERVAL, self.flush_lap_data
+            )
+
+    def process_message(self, message: str):
+        """Apply one WebSocket frame (one or more command lines) to the grid"""
+        debug = self.logger.isEnabledFor(logging.DEBUG)
+        self.message_count += 1
+        # Bound once per frame rather than looked up on self for every line
+        parse = self.parse_websocket_message
+        handlers = self._command_handlers
+        session_info = self.session_info
+        log_debug = self.logger.debug
+        try:
+            # Log the raw message (per-frame, so DEBUG only)
+            if debug:
+                log_debug(f"WebSocket message #{self.message_count}: {message}")
+        
+            # Split message by newlines as it contains multiple commands
+            lines = message.strip().split('\n')
+        
+            for i, line in enumerate(lines):
+                if not line.strip():
+                    continue
+                
+                # Parse each command line
+                parsed = parse(line)
+                if not parsed:
+                    continue
+                
+                command, parameter, value = parsed
+            
+                # Process different message types
+                handler = handlers.get(command)
+                if handler is not None:
+                    handler(parameter, value)
+                elif command in SESSION_INFO_COMMANDS:
+                    # title1/title2, comment, message (best lap info etc), track info
+                    key = SESSION_INFO_COMMANDS[command]
+                    session_info[key] = value
+                    if debug:
+                        log_debug(f"Session {key}: {value}")
+                elif command.startswith('r') and 'c' in command:
+                    # Cell update message (e.g., r15c6|ti|3:28.267)
+                    cell_id = command
+                    update_type = parameter
+                
+                    # Parse cell ID (format: r{row}c{col})
+                    match = re.match(r'r(\d+)c(\d+)', cell_id)
+                    if match:
+                        row_id = f"r{match.group(1)}"
+                        col_idx = int(match.group(2)) - 1  # Column index is 1-based, convert to 0-based
+                    
+                        # Initialize row if needed
+                        if row_id not in self.grid_data:
+                            self.grid_data[row_id] = RowState()
+                    
+                        # Use custom column mappings if available, otherwise use defaults
+                        if self.custom_column_map and col_idx in self.custom_column_map:
+                            # Use custom mapping
+                            field_name = self.custom_column_map[col_idx]
+                            if field_name == 'Status' and update_type in ['gs', 'si', 'so', 'su', 'sd']:
+                                # Handle status updates ('gs' is green/on track)
+                                self._set_cell(row_id, 'Status', _STATUS_MAP.get(update_type, 'On Track'))
+                            else:
+                                # Regular field update
+                                self._set_cell(row_id, field_name, value)
+                                if field_name == 'Kart' and value:
+                                    self.row_map[row_id] = value
+                        elif col_idx == 0:  # c1 - Status (default mapping)
+                            if update_type in ['sr', 'si', 'so', 'su', 'sd', 'in']:
+                                # 'in' is not a status code but means on track
+                                self._set_cell(row_id, 'Status', _STATUS_MAP.get(update_type, 'On Track'))
+                        elif col_idx == 1:  # c2 - Position
+                            self._set_cell(row_id, 'Position', value)
+                        elif col_idx == 2:  # c3 - Kart number
+                            self._set_cell(row_id, 'Kart', value)
+                            if value:
+                                self.row_map[row_id] = value
+                        elif col_idx == 3:  # c4 - Team name
+                            self._set_cell(row_id, 'Team', value)
+                        elif col_idx == 4:  # c5 - Last Lap
+                            self._set_cell(row_id, 'Last Lap', value)
+                        elif col_idx == 5:  # c6 - Gap
+                            self._set_cell(row_id, 'Gap', value)
+                        elif col_idx == 6:  # c7 - Interval
+                            self._set_cell(row_id, 'Interval', value)
+                        elif col_idx == 7:  # c8 - Best Lap
+                            self._set_cell(row_id, 'Best Lap', value)
+                        elif col_idx == 8:  # c9 - RunTime
+                            self._set_cell(row_id, 'RunTime', value)
+                        elif col_idx == 9:  # c10 - Pit Stops
+                            self._set_cell(row_id, 'Pit Stops', value)
+                    
+                        if debug:
+                            log_debug(f"Cell update: {cell_id} col={col_idx+1} type={update_type} value={value}")
+                elif command.startswith('r'):
+                    # Row update message (e.g., r35407|#|14)
+                    # These indicate position changes or other row-level updates
+                    row_id = command
+                    update_type = parameter
+                
+                    if update_type == '#':
+                        # Position update
+                        if row_id not in self.grid_data:
+                            self.grid_data[row_id] = RowState()
+                        self._set_cell(row_id, 'Position', value)
+                        if debug:
+                            log_debug(f"Position update: {row_id} -> position {value}")
+                    elif update_type == '*':
+                        # Some other update, possibly timing
+                        if debug:
+                            log_debug(f"Row update: {row_id} type={update_type} value={value}")
+                else:
+                    # Log unrecognized commands
+                    if debug:
+                        log_debug(f"Unrecognized command: {command} with parameter={parameter} and value={value[:50]}...")
+                
+            if debug:
+                log_debug(f"=== End of WebSocket message #{self.message_count} processing ===")
+            
+        except Exception as e:
+            self.logger.error(f"Error processing message: {e}")
+            self.logger.error(traceback.format_exc())
+
     async def monitor_race_websocket(self, ws_url: str, session_name: str = "Live Session", 
                                    track: str = "Karting Mariembourg"):
         """Monitor race data via WebSocket"""
         session_id = self.store_session_data(session_name, track)
+        self.session_id = session_id
         reconnect_delay = 5
         
         while True:
@@ -763,173 +1125,17 @@ class ApexTimingWebSocketParser:
                 except Exception as e:
                     self.logger.warning(f"Could not send init message: {e}")
                 
-                # Listen for messages
+                # Listen for messages. The reader task only drains the socket
+                # into the queue, so a slow batch never holds up recv().
                 self.logger.debug("Waiting for WebSocket messages...")
-                message_count = 0
-                async for message in self.websocket:
-                    message_count += 1
-                    try:
-                        # Log only the raw message
-                        self.logger.info(f"WebSocket message #{message_count}: {message}")
-                        
-                        # Split message by newlines as it contains multiple commands
-                        lines = message.strip().split('\n')
-                        
-                        for i, line in enumerate(lines):
-                            if not line.strip():
-                                continue
-                                
-                            # Parse each command line
-                            parsed = self.parse_websocket_message(line)
-                            if not parsed:
-                                continue
-                                
-                            command = parsed['command']
-                            
-                            # Process different message types
-                            if command == 'init':
-                                self.process_init_message(parsed)
-                            elif command == 'grid':
-                                self.process_grid_message(parsed)
-                            elif command == 'update':
-                                self.process_update_message(parsed)
-                            elif command == 'css':
-                                self.process_css_message(parsed)
-                            elif command == 'title1':
-                                self.session_info['title1'] = parsed['value']
-                                self.logger.debug(f"Session title1: {parsed['value']}")
-                            elif command == 'title2':
-                                self.session_info['title2'] = parsed['value']
-                                self.logger.debug(f"Session title2: {parsed['value']}")
-                            elif command == 'title':
-                                self.process_title_message(parsed)
-                            elif command == 'clear':
-                                # Clear data for the specified element
-                                if parsed['parameter'] == 'grid':
-                                    self.grid_data.clear()
-                                    self.row_map.clear()
-                            elif command == 'com':
-                                # Comment/info message
-                                self.session_info['comment'] = parsed['value']
-                                self.logger.debug(f"Comment message: {parsed['value']}")
-                            elif command == 'msg':
-                                # Message (best lap info etc)
-                                self.session_info['message'] = parsed['value']
-                                self.logger.debug(f"Message update: {parsed['value']}")
-                            elif command == 'track':
-                                # Track info
-                                self.session_info['track'] = parsed['value']
-                                self.logger.debug(f"Track info: {parsed['value']}")
-                            elif command.startswith('r') and 'c' in command:
-                                # Cell update message (e.g., r15c6|ti|3:28.267)
-                                cell_id = command
-                                update_type = parsed['parameter']
-                                value = parsed['value']
-                                
-                                # Parse cell ID (format: r{row}c{col})
-                                match = re.match(r'r(\d+)c(\d+)', cell_id)
-                                if match:
-                                    row_id = f"r{match.group(1)}"
-                                    col_idx = int(match.group(2)) - 1  # Column index is 1-based, convert to 0-based
-                                    
-                                    # Initialize row if needed
-                                    if row_id not in self.grid_data:
-                                        self.grid_data[row_id] = {}
-                                    
-                                    # Use custom column mappings if available, otherwise use defaults
-                                    if self.custom_column_map and col_idx in self.custom_column_map:
-                                        # Use custom mapping
-                                        field_name = self.custom_column_map[col_idx]
-                                        if field_name == 'Status' and update_type in ['gs', 'si', 'so', 'su', 'sd']:
-                                            # Handle status updates
-                                            if update_type == 'gs':
-                                                self.grid_data[row_id]['Status'] = 'On Track'
-                                            elif update_type == 'si':
-                                                self.grid_data[row_id]['Status'] = 'Pit-in'
-                                            elif update_type == 'so':
-                                                self.grid_data[row_id]['Status'] = 'Pit-out'
-                                            elif update_type == 'su':
-                                                self.grid_data[row_id]['Status'] = 'Up'
-                                            elif update_type == 'sd':
-                                                self.grid_data[row_id]['Status'] = 'Down'
-                                        else:
-                                            # Regular field update
-                                            self.grid_data[row_id][field_name] = value
-                                            if field_name == 'Kart' and value:
-                                                self.row_map[row_id] = value
-                                    elif col_idx == 0:  # c1 - Status (default mapping)
-                                        if update_type in ['sr', 'si', 'so', 'su', 'sd', 'in']:
-                                            if update_type == 'sr' or update_type == 'in':
-                                                self.grid_data[row_id]['Status'] = 'On Track'
-                                            elif update_type == 'si':
-                                                self.grid_data[row_id]['Status'] = 'Pit-in'
-                                            elif update_type == 'so':
-                                                self.grid_data[row_id]['Status'] = 'Pit-out'
-                                            elif update_type == 'su':
-                                                self.grid_data[row_id]['Status'] = 'Up'
-                                            elif update_type == 'sd':
-                                                self.grid_data[row_id]['Status'] = 'Down'
-                                    elif col_idx == 1:  # c2 - Position
-                                        self.grid_data[row_id]['Position'] = value
-                                    elif col_idx == 2:  # c3 - Kart number
-                                        self.grid_data[row_id]['Kart'] = value
-                                        if value:
-                                            self.row_map[row_id] = value
-                                    elif col_idx == 3:  # c4 - Team name
-                                        self.grid_data[row_id]['Team'] = value
-                                    elif col_idx == 4:  # c5 - Last Lap
-                                        self.grid_data[row_id]['Last Lap'] = value
-                                    elif col_idx == 5:  # c6 - Gap
-                                        self.grid_data[row_id]['Gap'] = value
-                                    elif col_idx == 6:  # c7 - Interval
-                                        self.grid_data[row_id]['Interval'] = value
-                                    elif col_idx == 7:  # c8 - Best Lap
-                                        self.grid_data[row_id]['Best Lap'] = value
-                                    elif col_idx == 8:  # c9 - RunTime
-                                        self.grid_data[row_id]['RunTime'] = value
-                                    elif col_idx == 9:  # c10 - Pit Stops
-                                        self.grid_data[row_id]['Pit Stops'] = value
-                                    
-                                    self.logger.debug(f"Cell update: {cell_id} col={col_idx+1} type={update_type} value={value}")
-                            elif command.startswith('r'):
-                                # Row update message (e.g., r35407|#|14)
-                                # These indicate position changes or other row-level updates
-                                row_id = command
-                                update_type = parsed['parameter']
-                                value = parsed['value']
-                                
-                                if update_type == '#':
-                                    # Position update
-                                    if row_id not in self.grid_data:
-                                        self.grid_data[row_id] = {}
-                                    self.grid_data[row_id]['Position'] = value
-                                    self.logger.debug(f"Position update: {row_id} -> position {value}")
-                                elif update_type == '*':
-                                    # Some other update, possibly timing
-                                    self.logger.debug(f"Row update: {row_id} type={update_type} value={value}")
-                            else:
-                                # Log unrecognized commands
-                                self.logger.debug(f"Unrecognized command: {command} with parameter={parsed.get('parameter', 'N/A')} and value={parsed.get('value', 'N/A')[:50]}...")
-                                
-                        # After processing all commands in the message, save to database
-                        df = self.get_current_standings()
-                        if not df.empty:
-                            self.store_lap_data(session_id, df)
-                            self.logger.debug(f"Processed {len(df)} teams from WebSocket message #{message_count}")
-                            # Log sample data for debugging
-                            if len(df) > 0:
-                                first_team = df.iloc[0]
-                                self.logger.debug(f"Leader: Pos={first_team.get('Position')}, "
-                                               f"Kart={first_team.get('Kart')}, Team={first_team.get('Team')}, "
-                                               f"Gap={first_team.get('Gap')}, Status={first_team.get('Status')}")
-                        else:
-                            self.logger.debug(f"No team data in WebSocket message #{message_count}")
-                        
-                        self.logger.debug(f"=== End of WebSocket message #{message_count} processing ===")
-                            
-                    except Exception as e:
-                        self.logger.error(f"Error processing message: {e}")
-                        self.logger.error(traceback.format_exc())
+                self.message_count = 0
+                queue: asyncio.Queue = asyncio.Queue()
+                reader = asyncio.create_task(self._read_messages(queue))
+                try:
+                    await self._process_messages(queue)
+                    await reader  # Re-raise whatever ended the connection
+                finally:
+                    reader.cancel()
                         
             except websockets.exceptions.ConnectionClosed as e:
                 self.logger.warning(f"WebSocket connection closed: {e}")
@@ -943,9 +1149,18 @@ class ApexTimingWebSocketParser:
                 await asyncio.sleep(reconnect_delay)
                 
     async def get_current_data(self) -> Tuple[pd.DataFrame, Dict[str, str]]:
-        """Get current race data in format compatible with existing code"""
-        df = self.get_current_standings()
-        return df, self.session_info
+        """Get current race data in format compatible with existing code.
+
+        The DataFrame is only built here, at the API boundary; the message
+        loop itself works on the plain row dicts. It is rebuilt only when the
+        standings list changed since the last call, so polling a quiet feed
+        costs nothing.
+        """
+        teams = self.get_current_standings()
+        if self._standings_df is None or teams is not self._standings_df_source:
+            self._standings_df = pd.DataFrame(teams)
+            self._standings_df_source = teams
+        return self._standings_df, self.session_info
 
 
 # Example usage
@@ -961,8 +1176,9 @@ async def main():
     except KeyboardInterrupt:
         print("Stopping WebSocket monitor...")
     finally:
-        await parser.disconnect_websocket()
+        await parser.cleanup()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    with asyncio.Runner(loop_factory=new_event_loop) as runner:
+        runner.run(main())
\ No newline at end of file
@@ -1,22 +1,206 @@
+import json
 import sqlite3
 import os
-from typing import List, Dict, Optional
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
 import logging
 
+try:
+    # Optional: faster column_mappings (de)serialisation. Falls back to the
+    # stdlib json module when absent.
+    import orjson
+except ImportError:  # pragma: no cover - depends on the install
+    orjson = None
+
+if orjson is not None:
+    _json_loads = orjson.loads
+
+    def _json_dumps(obj) -> str:
+        # OPT_NON_STR_KEYS matches json.dumps for {0: 'Status'}-style mappings
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+else:  # pragma: no cover - depends on the install
+    _json_loads = json.loads
+    _json_dumps = json.dumps
+
+# Hot statements are kept as fixed module-level strings so the pooled
+# connections' statement cache hits on every call instead of re-preparing.
+_SQL_GET_ALL = '''
+    SELECT id, track_name, timing_url, websocket_url, column_mappings,
+           location, length_meters, description, is_active, provider,
+           pusher_key, pusher_cluster, pusher_site, pusher_channel_suffix,
+           pusher_cookies,
+           created_at, updated_at
+    FROM tracks
+    ORDER BY track_name
+'''
+
+_SQL_GET_BY_ID = '''
+    SELECT id, track_name, timing_url, websocket_url, column_mappings,
+           location, length_meters, description, is_active, provider,
+           created_at, updated_at
+    FROM tracks
+    WHERE id = ?
+'''
+
+_SQL_GET_NAMES = 'SELECT track_name FROM tracks'
+
+_SQL_INSERT = '''
+    INSERT INTO tracks (track_name, timing_url, websocket_url, column_mappings,
+                        location, length_meters, description, is_active, provider)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# One fixed UPDATE for every update shape: a None argument leaves the
+# column as it is, so the statement text never varies between calls.
+_SQL_UPDATE = '''
+    UPDATE tracks SET
+        track_name = COALESCE(?, track_name),
+        timing_url = COALESCE(?, timing_url),
+        websocket_url = COALESCE(?, websocket_url),
+        column_mappings = COALESCE(?, column_mappings),
+        location = COALESCE(?, location),
+        length_meters = COALESCE(?, length_meters),
+        description = COALESCE(?, description),
+        is_active = COALESCE(?, is_active),
+        provider = COALESCE(?, provider)
+    WHERE id = ?
+'''
+
+_SQL_DELETE = 'DELETE FROM tracks WHERE id = ?'
+
 class TrackDatabase:
     """
     Manages persistent track data in a separate database (tracks.db).
     This database is independent from race_data.db and should never be cleared.
     """
+    # Idle connections kept open between calls. Flask serves requests from
+    # several threads, so connections are created on demand up to this many
+    # and reused afterwards; extras beyond it are simply closed.
+    POOL_SIZE = 8
+
+    # Stamped into PRAGMA user_version once init_database() has applied the
+    # schema below. Bump it whenever that schema changes so existing files
+    # re-run the (idempotent) CREATE/ALTER block exactly once.
+    SCHEMA_VERSION = 2
+
     def __init__(self, db_path='tracks.db'):
         self.db_path = db_path
         self.logger = logging.getLogger(__name__)
+        self._pool: queue.Queue = queue.Queue(maxsize=self.POOL_SIZE)
+        self._schema_ready = False
+        # Read-through caches for get_all_tracks/get_track_by_id, valid while
+        # PRAGMA data_version on the watch connection is unchanged.
+        self._watch: Optional[sqlite3.Connection] = None
+        self._watch_lock = threading.Lock()
+        self._cache_version: Optional[int] = None
+        self._all_tracks_cache: Optional[List[Dict]] = None
+        self._track_cache: Dict[int, Dict] = {}
         self.init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection tuned for concurrent readers and one writer.
+
+        WAL is persistent per file, so re-issuing it here is a cheap no-op
+        once set; busy_timeout rides out a concurrent writer instead of
+        failing with "database is locked".
+        """
+        conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                               cached_statements=128)
+        if self.db_path != ':memory:':
+            conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.execute("PRAGMA cache_size=-20000")
+        # Pooled connections live as long as the server, so close() alone
+        # would almost never run it; 0x10002 is SQLite's on-open form, which
+        # re-analyzes only tables whose statistics have gone stale.
+        conn.execute("PRAGMA optimize=0x10002")
+        return conn
+
+    @contextmanager
+    def _conn(self):
+        """Borrow a pooled connection for one unit of work.
+
+        Commits on success and rolls back on error, like ``with conn:``; the
+        connection then goes back to the pool so its page cache stays warm.
+        """
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.row_factory = None
+            try:
+                self._pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def close(self):
+        """Close every idle pooled connection"""
+        while True:
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            # Refreshes planner statistics only where they have gone stale
+            conn.execute('PRAGMA optimize')
+            conn.close()
+        with self._watch_lock:
+            if self._watch is not None:
+                self._watch.close()
+                self._watch = None
+
+    def _data_version(self) -> int:
+        """PRAGMA data_version on the watch connection (hold _watch_lock).
+
+        The watch connection never writes, so the value moves on every
+        commit made through the pool, by another TrackDatabase instance or by
+        another process (admin scripts), without scanning any table.
+        """
+        if self._watch is None:
+            self._watch = sqlite3.connect(self.db_path, check_same_thread=False)
+        return self._watch.execute('PRAGMA data_version').fetchone()[0]
+
+    def _check_cache(self) -> int:
+        """Drop the read caches if tracks.db changed since they were filled.
+
+        Returns the data_version read; a caller that then queries the
+        database may only cache the result if _cache_current() still
+        agrees, so rows read around a concurrent commit are never kept.
+        """
+        with self._watch_lock:
+            version = self._data_version()
+            if version != self._cache_version:
+                self._all_tracks_cache = None
+                self._track_cache = {}
+                self._cache_version = version
+            return version
+
+    def _cache_current(self, version: int) -> bool:
+        """True if nothing committed since _check_cache() returned version.
+        Call with _watch_lock held, and fill the cache under the same hold."""
+        return version == self._cache_version == self._data_version()
     
     def init_database(self):
         """Initialize the database with tracks table"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._conn() as conn:
+                if conn.execute('PRAGMA user_version').fetchone()[0] >= self.SCHEMA_VERSION:
+                    self._schema_ready = True
+                    return
+
+                # All DDL below commits as one transaction. IMMEDIATE takes the
+                # write lock up front, so two processes initialising at once
+                # queue on busy_timeout instead of deadlocking on lock upgrade.
+                conn.execute('BEGIN IMMEDIATE')
                 # Create tracks table
                 # Fresh-install schema. Historically location/length_meters/
                 # description/is_active/provider were added by external
@@ -95,6 +279,14 @@ class TrackDatabase:
                 if 'pusher_cookies' not in columns:
                     conn.execute("ALTER TABLE tracks ADD COLUMN pusher_cookies TEXT")
 
+                # The blueprints list active tracks with
+                # "SELECT id, track_name FROM tracks WHERE is_active = 1";
+                # this partial index answers that from the index alone.
+                conn.execute(
+                    'CREATE INDEX IF NOT EXISTS idx_tracks_name_active '
+                    'ON tracks(track_name, is_active) WHERE is_active = 1'
+                )
+
                 # Physical-layout definitions per track. A single karting venue
                 # often runs multiple configs whose lap times differ 10%+; the
                 # fairness analytics bucket sessions into layouts to avoid
@@ -131,26 +323,30 @@ class TrackDatabase:
                     END
                 ''')
 
+                # Give the planner statistics for the new indexes
+                conn.execute('ANALYZE')
+                conn.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
                 conn.commit()
+                # CREATE TABLE IF NOT EXISTS committed without raising, so the
+                # table exists; no sqlite_master re-check needed.
+                self._schema_ready = True
                 self.logger.info(f"Database initialized with tracks table in {self.db_path}")
-                
-                # Verify table was created
-                cursor = conn.cursor()
-                cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='tracks'")
-                if cursor.fetchone():
-                    self.logger.info(f"Tracks table verified successfully in {self.db_path}")
-                else:
-                    self.logger.error(f"Failed to create tracks table in {self.db_path}")
-                    
+
         except Exception as e:
             self.logger.error(f"Error initializing database: {e}")
             print(f"ERROR: Failed to initialize tracks table: {e}")
             raise
     
     def ensure_table_exists(self):
-        """Ensure the tracks table exists before any operation"""
+        """Ensure the tracks table exists before any operation.
+
+        A no-op once init_database() has verified the schema, so callers can
+        use it freely without paying a sqlite_master lookup each time.
+        """
+        if self._schema_ready:
+            return
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._conn() as conn:
                 cursor = conn.cursor()
                 cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='tracks'")
                 if not cursor.fetchone():
@@ -165,18 +361,13 @@ class TrackDatabase:
                   length_meters: Optional[int] = None, description: Optional[str] = None,
                   is_active: bool = True, provider: str = 'apex') -> Dict:
         """Add a new track to the database"""
-        self.ensure_table_exists()  # Ensure table exists before operation
         try:
-            import json
-            with sqlite3.connect(self.db_path) as conn:
+            with self._conn() as conn:
                 cursor = conn.cursor()
-                mappings_json = json.dumps(column_mappings or {})
-                cursor.execute('''
-                    INSERT INTO tracks (track_name, timing_url, websocket_url, column_mappings,
-                                        location, length_meters, description, is_active, provider)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (track_name, timing_url, websocket_url, mappings_json,
-                      location, length_meters, description, is_active, provider))
+                mappings_json = _json_dumps(column_mappings or {})
+                cursor.execute(_SQL_INSERT, (
+                    track_name, timing_url, websocket_url, mappings_json,
+                    location, length_meters, description, is_active, provider))
 
                 track_id = cursor.lastrowid
                 conn.commit()
@@ -199,104 +390,123 @@ class TrackDatabase:
         except Exception as e:
             self.logger.error(f"Error adding track: {e}")
             return {'error': str(e)}
+
+    def add_tracks(self, rows: List[Dict], skip_existing: bool = False) -> Dict:
+        """Add many tracks in one transaction.
+
+        Each row takes the same keys as add_track(). The batch is all or
+        nothing: a duplicate name rolls back every row in it. With
+        skip_existing, rows whose name is already in the table are left out
+        instead, checked under the same write lock as the insert.
+        """
+        try:
+            with self._conn() as conn:
+                if skip_existing:
+                    conn.execute('BEGIN IMMEDIATE')
+                    existing = {name for (name,) in conn.execute(_SQL_GET_NAMES)}
+                    rows = [row for row in rows if row['track_name'] not in existing]
+                else:
+                    conn.execute('BEGIN')
+                params = (
+                    (row['track_name'], row['timing_url'], row.get('websocket_url'),
+                     _json_dumps(row.get('column_mappings') or {}),
+                     row.get('location'), row.get('length_meters'), row.get('description'),
+                     row.get('is_active', True), row.get('provider', 'apex'))
+                    for row in rows
+                )
+                cursor = conn.executemany(_SQL_INSERT, params)
+                added = cursor.rowcount
+            return {'added': added, 'message': f'{added} track(s) added successfully'}
+        except sqlite3.IntegrityError:
+            return {'error': 'Track with this name already exists'}
+        except Exception as e:
+            self.logger.error(f"Error adding tracks: {e}")
+            return {'error': str(e)}
     
+    def _parse_mappings(self, track_id, raw) -> Dict:
+        """Decode a column_mappings cell, falling back to {} on bad JSON"""
+        if not raw:
+            return {}
+        try:
+            return _json_loads(raw)
+        except (json.JSONDecodeError, TypeError) as e:
+            self.logger.warning(
+                f"Track {track_id}: invalid column_mappings JSON, falling back to data-type detection: {e}"
+            )
+            return {}
+
+    def _tracks_from_rows(self, rows) -> Iterator[Dict]:
+        """Lazily turn _SQL_GET_ALL rows into track dicts"""
+        parse = self._parse_mappings
+        # Positional access on plain tuples; see _SQL_GET_ALL for order
+        return (
+            {
+                'id': r[0],
+                'track_name': r[1],
+                'timing_url': r[2],
+                'websocket_url': r[3],
+                'column_mappings': parse(r[0], r[4]),
+                'location': r[5],
+                'length_meters': r[6],
+                'description': r[7],
+                'is_active': r[8],
+                'provider': (r[9] or 'apex'),
+                'pusher_key': r[10],
+                'pusher_cluster': r[11],
+                'pusher_site': r[12],
+                'pusher_channel_suffix': r[13],
+                'pusher_cookies': r[14],
+                'created_at': r[15],
+                'updated_at': r[16]
+            }
+            for r in rows
+        )
+
     def get_all_tracks(self) -> List[Dict]:
         """Get all tracks from the database"""
-        self.ensure_table_exists()  # Ensure table exists before operation
         try:
-            import json
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT id, track_name, timing_url, websocket_url, column_mappings,
-                           location, length_meters, description, is_active, provider,
-                           pusher_key, pusher_cluster, pusher_site, pusher_channel_suffix,
-                           pusher_cookies,
-                           created_at, updated_at
-                    FROM tracks
-                    ORDER BY track_name
-                ''')
-
-                tracks = []
-                for row in cursor.fetchall():
-                    mappings = {}
-                    raw_mappings = row['column_mappings']
-                    if raw_mappings:
-                        try:
-                            mappings = json.loads(raw_mappings)
-                        except (json.JSONDecodeError, TypeError) as e:
-                            self.logger.warning(
-                                f"Track {row['id']}: invalid column_mappings JSON, falling back to data-type detection: {e}"
-                            )
-
-                    tracks.append({
-                        'id': row['id'],
-                        'track_name': row['track_name'],
-                        'timing_url': row['timing_url'],
-                        'websocket_url': row['websocket_url'],
-                        'column_mappings': mappings,
-                        'location': row['location'],
-                        'length_meters': row['length_meters'],
-                        'description': row['description'],
-                        'is_active': row['is_active'],
-                        'provider': (row['provider'] or 'apex'),
-                        'pusher_key': row['pusher_key'],
-                        'pusher_cluster': row['pusher_cluster'],
-                        'pusher_site': row['pusher_site'],
-                        'pusher_channel_suffix': row['pusher_channel_suffix'],
-                        'pusher_cookies': row['pusher_cookies'],
-                        'created_at': row['created_at'],
-                        'updated_at': row['updated_at']
-                    })
-
-                return tracks
+            version = self._check_cache()
+            cached = self._all_tracks_cache
+            if cached is not None:
+                return [dict(t) for t in cached]
+            with self._conn() as conn:
+                tracks = list(self._tracks_from_rows(conn.execute(_SQL_GET_ALL)))
+            with self._watch_lock:
+                if self._cache_current(version):
+                    self._all_tracks_cache = tracks
+            return [dict(t) for t in tracks]
         except Exception as e:
             self.logger.error(f"Error getting tracks: {e}")
             return []
-    
+
     def get_track_by_id(self, track_id: int) -> Optional[Dict]:
         """Get a specific track by ID"""
-        self.ensure_table_exists()  # Ensure table exists before operation
         try:
-            import json
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT id, track_name, timing_url, websocket_url, column_mappings,
-                           location, length_meters, description, is_active, provider,
-                           created_at, updated_at
-                    FROM tracks
-                    WHERE id = ?
-                ''', (track_id,))
-
-                row = cursor.fetchone()
-                if row:
-                    mappings = {}
-                    raw_mappings = row['column_mappings']
-                    if raw_mappings:
-                        try:
-                            mappings = json.loads(raw_mappings)
-                        except (json.JSONDecodeError, TypeError) as e:
-                            self.logger.warning(
-                                f"Track {row['id']}: invalid column_mappings JSON, falling back to data-type detection: {e}"
-                            )
-
-                    return {
-                        'id': row['id'],
-                        'track_name': row['track_name'],
-                        'timing_url': row['timing_url'],
-                        'websocket_url': row['websocket_url'],
-                        'column_mappings': mappings,
-                        'location': row['location'],
-                        'length_meters': row['length_meters'],
-                        'description': row['description'],
-                        'is_active': row['is_active'],
-                        'provider': (row['provider'] or 'apex'),
-                        'created_at': row['created_at'],
-                        'updated_at': row['updated_at']
+            version = self._check_cache()
+            cached = self._track_cache.get(track_id)
+            if cached is not None:
+                return dict(cached)
+            with self._conn() as conn:
+                r = conn.execute(_SQL_GET_BY_ID, (track_id,)).fetchone()
+                if r:
+                    track = {
+                        'id': r[0],
+                        'track_name': r[1],
+                        'timing_url': r[2],
+                        'websocket_url': r[3],
+                        'column_mappings': self._parse_mappings(r[0], r[4]),
+                        'location': r[5],
+                        'length_meters': r[6],
+                        'description': r[7],
+                        'is_active': r[8],
+                        'provider': (r[9] or 'apex'),
+                        'created_at': r[10],
+                        'updated_at': r[11]
                     }
+                    with self._watch_lock:
+                        if self._cache_current(version):
+                            self._track_cache[track_id] = track
+                    return dict(track)
                 return None
         except Exception as e:
             self.logger.error(f"Error getting track: {e}")
@@ -308,72 +518,19 @@ class TrackDatabase:
                      length_meters: Optional[int] = None, description: Optional[str] = None,
                      is_active: Optional[bool] = None, provider: Optional[str] = None) -> Dict:
         """Update a track's information"""
-        self.ensure_table_exists()  # Ensure table exists before operation
         try:
-            import json
-            with sqlite3.connect(self.db_path) as conn:
+            with self._conn() as conn:
                 cursor = conn.cursor()
 
-                # Build update query dynamically based on provided fields
-                update_fields = []
-                params = []
-
-                if track_name is not None:
-                    update_fields.append("track_name = ?")
-                    params.append(track_name)
-
-                if timing_url is not None:
-                    update_fields.append("timing_url = ?")
-                    params.append(timing_url)
-
-                if websocket_url is not None:
-                    update_fields.append("websocket_url = ?")
-                    params.append(websocket_url)
-
-                if column_mappings is not None:
-                    update_fields.append("column_mappings = ?")
-                    params.append(json.dumps(column_mappings))
-
-                if location is not None:
-                    update_fields.append("location = ?")
-                    params.append(location)
-
-                if length_meters is not None:
-                    update_fields.append("length_meters = ?")
-                    params.append(length_meters)
-
-                if description is not None:
-                    update_fields.append("description = ?")
-                    params.append(description)
-
-                if is_active is not None:
-                    update_fields.append("is_active = ?")
-                    params.append(is_active)
-
-                if provider is not None:
-                    update_fields.append("provider = ?")
-                    params.append(provider)
-
-                if not update_fields:
+                params = (
+                    track_name, timing_url, websocket_url,
+                    _json_dumps(column_mappings) if column_mappings is not None else None,
+                    location, length_meters, description, is_active, provider,
+                )
+                if all(p is None for p in params):
                     return {'error': 'No fields to update'}
 
-                # Validate column names before building the query. Each entry is
-                # "col = ?" constructed from a hardcoded whitelist above; extract
-                # the column and assert it's in the known set so future additions
-                # can't inject arbitrary SQL via parameter name confusion.
-                _VALID_TRACK_COLS = {
-                    'track_name', 'timing_url', 'websocket_url', 'column_mappings',
-                    'location', 'length_meters', 'description', 'is_active', 'provider',
-                }
-                for field in update_fields:
-                    col = field.split(' = ', 1)[0]
-                    if col not in _VALID_TRACK_COLS:
-                        raise ValueError(f'Invalid column in update: {col!r}')
-
-                params.append(track_id)
-                query = f"UPDATE tracks SET {', '.join(update_fields)} WHERE id = ?"
-
-                cursor.execute(query, params)
+                cursor.execute(_SQL_UPDATE, (*params, track_id))
 
                 if cursor.rowcount == 0:
                     return {'error': 'Track not found'}
@@ -401,9 +558,8 @@ class TrackDatabase:
         captured from the scrape. The next process start can hydrate the
         site's requests.Session from this and skip the page scrape entirely
         — the big win that gets us under Cloudflare's per-IP cap."""
-        self.ensure_table_exists()
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._conn() as conn:
                 conn.execute('''
                     UPDATE tracks
                        SET pusher_key = ?, pusher_cluster = ?,
@@ -420,11 +576,10 @@ class TrackDatabase:
 
     def delete_track(self, track_id: int) -> Dict:
         """Delete a track from the database"""
-        self.ensure_table_exists()  # Ensure table exists before operation
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._conn() as conn:
                 cursor = conn.cursor()
-                cursor.execute('DELETE FROM tracks WHERE id = ?', (track_id,))
+                cursor.execute(_SQL_DELETE, (track_id,))
 
                 if cursor.rowcount == 0:
                     return {'error': 'Track not found'}
@@ -453,7 +608,7 @@ class TrackDatabase:
 
     def get_layouts_for_track(self, track_id: int) -> List[Dict]:
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._conn() as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.cursor()
                 cursor.execute('''
@@ -470,7 +625,7 @@ class TrackDatabase:
 
     def get_layout_by_id(self, layout_id: int) -> Optional[Dict]:
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._conn() as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.cursor()
                 cursor.execute('''
@@ -491,7 +646,7 @@ class TrackDatabase:
         if not name or not name.strip():
             return {'error': 'Layout name is required'}
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._conn() as conn:
                 cursor = conn.cursor()
                 if is_default:
                     cursor.execute(
@@ -555,7 +710,7 @@ class TrackDatabase:
                     raise ValueError(f'Invalid column in layout update: {col!r}')
 
             params.append(layout_id)
-            with sqlite3.connect(self.db_path) as conn:
+            with self._conn() as conn:
                 if is_default:
                     conn.execute(
                         'UPDATE track_layouts SET is_default = 0 WHERE track_id = ? AND id != ?',
@@ -575,7 +730,7 @@ class TrackDatabase:
 
     def delete_layout(self, layout_id: int) -> Dict:
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._conn() as conn:
                 cursor = conn.cursor()
                 cursor.execute('DELETE FROM track_layouts WHERE id = ?', (layout_id,))
                 if cursor.rowcount == 0:
@@ -2,6 +2,9 @@
 """
 Initialize auth.db and tracks.db with required tables.
 
+The tracks.db schema itself is owned by database_manager.TrackDatabase,
+which versions it with PRAGMA user_version; this script only seeds it.
+
 Admin bootstrap:
   The first admin user is created if (and only if) no user exists yet. Credentials
   come from the ADMIN_USERNAME / ADMIN_PASSWORD environment variables (typically
@@ -14,6 +17,8 @@ import sys
 
 import bcrypt
 
+from database_manager import TrackDatabase
+
 
 def _require_admin_credentials():
     username = os.environ.get('ADMIN_USERNAME', '').strip()
@@ -30,13 +35,27 @@ def _require_admin_credentials():
     return username, password
 
 
+def _connect(db_path):
+    """Open ``db_path`` in WAL mode so the server's readers never block on a writer."""
+    conn = sqlite3.connect(db_path)
+    if db_path != ':memory:':
+        conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    return conn
+
+
 def initialize_auth_db():
     """Initialize auth database with users table"""
     print("Initializing auth.db...")
-    conn = sqlite3.connect('auth.db')
+    conn = _connect('auth.db')
     cursor = conn.cursor()
+    # Schema and seed rows go in as one transaction: a single fsync, and a
+    # half-initialised file is never left behind if bootstrap aborts. The
+    # BEGIN opened by the script stays open until the commit below.
+    cursor.executescript('''
+        BEGIN;
 
-    cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             username TEXT UNIQUE NOT NULL,
@@ -46,10 +65,8 @@ def initialize_auth_db():
             is_active BOOLEAN DEFAULT 1,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             last_login TIMESTAMP
-        )
-    ''')
+        );
 
-    cursor.execute('''
         CREATE TABLE IF NOT EXISTS sessions (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             user_id INTEGER NOT NULL,
@@ -57,17 +74,15 @@ def initialize_auth_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             expires_at TIMESTAMP,
             FOREIGN KEY (user_id) REFERENCES users(id)
-        )
-    ''')
+        );
 
-    cursor.execute('''
         CREATE TABLE IF NOT EXISTS login_attempts (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             username TEXT,
             ip_address TEXT,
             success BOOLEAN,
             attempted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
+        );
     ''')
 
     cursor.execute('SELECT COUNT(*) FROM users')
@@ -88,46 +103,32 @@ def initialize_auth_db():
     print("auth.db initialized successfully")
 
 
+# Tracks seeded on a fresh install; add_tracks skips any already present.
+DEFAULT_TRACKS = [
+    {
+        'track_name': 'Karting Mariembourg',
+        'timing_url': 'https://www.apex-timing.com/live-timing/karting-mariembourg/index.html',
+        'websocket_url': 'ws://www.apex-timing.com:8585/',
+        'location': 'Mariembourg, Belgium',
+        'length_meters': 1360,
+        'description': 'Karting track in Mariembourg',
+    },
+]
+
+
 def initialize_tracks_db():
     """Initialize tracks database with tracks table"""
     print("Initializing tracks.db...")
-    conn = sqlite3.connect('tracks.db')
-    cursor = conn.cursor()
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS tracks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            track_name TEXT NOT NULL,
-            location TEXT,
-            length_meters INTEGER,
-            description TEXT,
-            timing_url TEXT,
-            websocket_url TEXT,
-            column_mappings TEXT,
-            is_active BOOLEAN DEFAULT 1,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-
-    cursor.execute("SELECT COUNT(*) FROM tracks WHERE track_name = 'Karting Mariembourg'")
-    if cursor.fetchone()[0] == 0:
-        cursor.execute('''
-            INSERT INTO tracks (track_name, location, length_meters, description, timing_url, websocket_url, is_active)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            'Karting Mariembourg',
-            'Mariembourg, Belgium',
-            1360,
-            'Karting track in Mariembourg',
-            'https://www.apex-timing.com/live-timing/karting-mariembourg/index.html',
-            'ws://www.apex-timing.com:8585/',
-            1,
-        ))
-        print("Created default Mariembourg track")
-
-    conn.commit()
-    conn.close()
+    # TrackDatabase owns the tracks.db schema and its migrations; this only
+    # seeds the default tracks, in one transaction.
+    db = TrackDatabase('tracks.db')
+    result = db.add_tracks(DEFAULT_TRACKS, skip_existing=True)
+    db.close()
+    if 'error' in result:
+        sys.stderr.write(f"ERROR: could not seed tracks.db: {result['error']}\n")
+        sys.exit(1)
+    if result['added']:
+        print(f"Created {result['added']} default track(s)")
     print("tracks.db initialized successfully")
 
 
@@ -4,17 +4,44 @@ Manages multiple WebSocket parsers, one per track, writing to separate databases
 """
 
 import asyncio
+import os
 import sqlite3
 import logging
 import threading
-from typing import Dict, List, Optional
+import time
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor, wait as wait_futures
+from typing import Dict, List, Optional, Set
 from datetime import datetime
 import json
-import pandas as pd
-from apex_timing_websocket import ApexTimingWebSocketParser
+import websockets
+from apex_timing_websocket import (
+    SESSION_INFO_COMMANDS, SQL_INSERT_LAP_HISTORY, SQL_INSERT_LAP_TIMES, SQL_INSERT_SESSION,
+    ApexTimingWebSocketParser, pit_stops_count, runtime_to_seconds,
+)
 
 import re as _re
 
+# create_or_get_session's lookup; a fixed string so the statement cache hits
+SQL_SELECT_SESSION_BY_NAME = (
+    'SELECT session_id FROM race_sessions WHERE name = ? AND track = ? '
+    'ORDER BY session_id DESC LIMIT 1'
+)
+
+
+def _configure_connection(conn: sqlite3.Connection):
+    """Apply the track databases' PRAGMAs. Only journal_mode persists in the
+    file, so every new connection needs the rest again."""
+    # Enable WAL mode for better concurrent access
+    conn.execute("PRAGMA journal_mode=WAL")
+    # In WAL, NORMAL only syncs at checkpoints: commits become appends
+    conn.execute("PRAGMA synchronous=NORMAL")
+    # Ride out dashboard readers / checkpoints instead of failing
+    conn.execute("PRAGMA busy_timeout=30000")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-20000")
+
+
 def _slug_from_url(url: str) -> str:
     """Extract the venue slug from an AlphaHub live-page URL
     (https://www.alpharacehub.com/<slug>/live). Falls back to '' if the URL
@@ -23,9 +50,36 @@ def _slug_from_url(url: str) -> str:
     return m.group(1) if m else ''
 
 
+def _parse_gap(gap_string) -> float:
+    """Convert gap string like '+12.456' or '12.456' to float"""
+    if not gap_string or gap_string in ('LEADER', 'Leader'):
+        return 0.0
+    try:
+        # float() already accepts a leading '+' and surrounding whitespace
+        return float(gap_string)
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def _socketio_rooms(socketio) -> Optional[dict]:
+    """Live room membership of the default namespace ({room: {sid: ...}}),
+    or None when the server doesn't expose it (e.g. not initialised yet)."""
+    try:
+        return socketio.server.manager.rooms.get('/', {})
+    except AttributeError:
+        return None
+
+
 class MultiTrackManager:
     """Manages multiple track parsers running concurrently"""
 
+    # all_tracks_status is emitted at most once per this many seconds; calls
+    # inside the window collapse into one trailing broadcast.
+    ALL_TRACKS_BROADCAST_INTERVAL = 1.0
+    # Worker threads shared by every track's blocking DB work. SQLite
+    # serialises writers per file anyway, so a few threads go a long way.
+    DB_WORKERS = min(4, os.cpu_count() or 1)
+
     def __init__(self, socketio=None):
         self.parsers: Dict[int, ApexTimingWebSocketParser] = {}
         self.tasks: Dict[int, asyncio.Task] = {}
@@ -37,6 +91,21 @@ class MultiTrackManager:
         # don't import alphahub_hub at all.
         self._alphahub_hub = None
         self._alphahub_hub_task = None
+        # Coalescing state for broadcast_all_tracks_status (called from
+        # the event loop, worker threads and request handlers alike)
+        self._broadcast_lock = threading.Lock()
+        self._last_broadcast = 0.0
+        self._broadcast_timer: Optional[threading.Timer] = None
+        self._db_executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def db_executor(self) -> ThreadPoolExecutor:
+        """Thread pool for the parsers' DB writes (see TrackSpecificParser.run_db)"""
+        if self._db_executor is None:
+            self._db_executor = ThreadPoolExecutor(
+                max_workers=self.DB_WORKERS, thread_name_prefix='track-db'
+            )
+        return self._db_executor
 
     def get_database_path(self, track_id: int) -> str:
         """Get the database file path for a track"""
@@ -47,10 +116,10 @@ class MultiTrackManager:
         db_path = self.get_database_path(track_id)
 
         try:
-            with sqlite3.connect(db_path, timeout=5.0) as conn:
-                # Enable WAL mode for better concurrent access
-                conn.execute("PRAGMA journal_mode=WAL")
-                conn.execute("PRAGMA busy_timeout=5000")
+            with sqlite3.connect(db_path, timeout=30.0) as conn:
+                # Switches the file to WAL, which persists; the per-connection
+                # settings are re-applied by TrackSpecificParser.get_db_connection
+                _configure_connection(conn)
                 conn.execute('''
                     CREATE TABLE IF NOT EXISTS race_sessions (
                         session_id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -85,9 +154,14 @@ class MultiTrackManager:
                     ON race_sessions(is_excluded)
                 ''')
 
+                # lap_times/lap_history are append-only, so plain rowid keys
+                # suffice: AUTOINCREMENT would add a sqlite_sequence update to
+                # every insert. RunTime is whole seconds; INTEGER affinity
+                # stores it as a 1-4 byte int rather than text. (Existing
+                # files keep their original schema.)
                 conn.execute('''
                     CREATE TABLE IF NOT EXISTS lap_times (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        id INTEGER PRIMARY KEY,
                         session_id INTEGER,
                         timestamp TEXT,
                         position INTEGER,
@@ -96,7 +170,7 @@ class MultiTrackManager:
                         last_lap TEXT,
                         best_lap TEXT,
                         gap TEXT,
-                        RunTime TEXT,
+                        RunTime INTEGER,
                         pit_stops INTEGER,
                         FOREIGN KEY (session_id) REFERENCES race_sessions(session_id)
                     )
@@ -104,7 +178,7 @@ class MultiTrackManager:
 
                 conn.execute('''
                     CREATE TABLE IF NOT EXISTS lap_history (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        id INTEGER PRIMARY KEY,
                         session_id INTEGER,
                         timestamp TEXT,
                         kart_number INTEGER,
@@ -259,7 +333,7 @@ class MultiTrackManager:
         Dispatches by provider:
           - 'apex'     (default)  → TrackSpecificParser (Apex pipe-delimited ws)
           - 'alphahub'            → AlphaHubParser (Pusher private channel)
-        Both subclass TrackSpecificParser so the per-track DB / monitor thread /
+        Both subclass TrackSpecificParser so the per-track DB / session monitor /
         Socket.IO broadcasts are identical from race_ui.py's point of view.
         """
         track_id = track['id']
@@ -333,7 +407,6 @@ class MultiTrackManager:
                         parser.set_column_mappings(mappings)
                     except Exception as e:
                         self.logger.error(f"Error setting column mappings for track {track_id}: {e}")
-                        import traceback
                         self.logger.error(traceback.format_exc())
                 else:
                     self.logger.debug(f"No column mappings for track {track_id}")
@@ -362,18 +435,16 @@ class MultiTrackManager:
 
         self.active = True
 
-        # Create tasks for all tracks
-        for track in tracks:
-            task = asyncio.create_task(self.start_track_parser(track))
-            self.tasks[track['id']] = task
-
-        self.logger.info(f"Started {len(self.tasks)} track parser(s)")
-
-        # Wait for all tasks (they run indefinitely until stopped). return_exceptions
-        # keeps the gather alive when a single task is cancelled (e.g. one track
-        # torn down via stop_track_parser) instead of unwinding the whole manager.
+        # Run every track in one TaskGroup; it returns once they have all
+        # finished (they run until stopped). A task cancelled on its own (one
+        # track torn down via stop_track_parser) doesn't disturb the group, and
+        # start_track_parser catches its own errors, so one track failing never
+        # cancels the others.
         try:
-            await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+            async with asyncio.TaskGroup() as tg:
+                for track in tracks:
+                    self.tasks[track['id']] = tg.create_task(self.start_track_parser(track))
+                self.logger.info(f"Started {len(self.tasks)} track parser(s)")
         except asyncio.CancelledError:
             self.logger.info("Parser tasks cancelled")
 
@@ -386,9 +457,9 @@ class MultiTrackManager:
         for track_id, task in self.tasks.items():
             task.cancel()
 
-        # Wait for tasks to finish
+        # Wait for tasks to finish (asyncio.wait never raises their errors)
         if self.tasks:
-            await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+            await asyncio.wait(self.tasks.values())
 
         # Cleanup parsers
         for parser in self.parsers.values():
@@ -412,12 +483,23 @@ class MultiTrackManager:
                 self.logger.warning(f"AlphaHubHub cleanup error: {e}")
             self._alphahub_hub = None
 
+        with self._broadcast_lock:
+            if self._broadcast_timer is not None:
+                self._broadcast_timer.cancel()
+                self._broadcast_timer = None
+
+        # Each parser's cleanup waited for its own run_db calls and flushed,
+        # so the pool is idle by now
+        if self._db_executor is not None:
+            await asyncio.to_thread(self._db_executor.shutdown)
+            self._db_executor = None
+
         self.logger.info("All parsers stopped")
 
     async def stop_track_parser(self, track_id: int) -> bool:
         """Stop and remove the parser for a single track (e.g. after deletion),
         without disturbing the other tracks. Cancels its task, closes its
-        websocket, and stops its monitor thread. Returns True if anything was
+        websocket, and stops its session monitor. Returns True if anything was
         torn down. Run on the manager's event loop (run_coroutine_threadsafe)."""
         task = self.tasks.pop(track_id, None)
         parser = self.parsers.pop(track_id, None)
@@ -474,30 +556,42 @@ class MultiTrackManager:
                 # multi-track status panel as a small badge so operators can
                 # tell Apex venues from AlphaHub venues at a glance.
                 'provider': getattr(parser, 'provider', 'apex'),
+                # Size of the last stored standings; reading it doesn't
+                # rebuild the grid on the caller's thread
+                'teams_count': getattr(parser, 'teams_count', 0),
             }
-
-            # Try to get teams count from current standings
-            try:
-                if hasattr(parser, 'get_current_standings'):
-                    standings = parser.get_current_standings()
-                    if standings is not None and not standings.empty:
-                        status['teams_count'] = len(standings)
-                    else:
-                        status['teams_count'] = 0
-                else:
-                    status['teams_count'] = 0
-            except Exception as e:
-                self.logger.warning(
-                    f"Track {track_id}: failed to read current standings for status: {e}"
-                )
-                status['teams_count'] = 0
-
             tracks_status.append(status)
 
         return tracks_status
 
     def broadcast_all_tracks_status(self):
-        """Broadcast status of all tracks to the all_tracks room"""
+        """Broadcast status of all tracks to the all_tracks room.
+
+        Rate-limited to one emit per ALL_TRACKS_BROADCAST_INTERVAL. A call
+        inside the window schedules a single trailing broadcast, which reads
+        the status when it fires, so the room always ends on the latest state.
+        """
+        if not self.socketio:
+            return
+        with self._broadcast_lock:
+            if self._broadcast_timer is not None:
+                return
+            wait = self._last_broadcast + self.ALL_TRACKS_BROADCAST_INTERVAL - time.monotonic()
+            if wait > 0:
+                self._broadcast_timer = threading.Timer(wait, self._trailing_broadcast)
+                self._broadcast_timer.daemon = True
+                self._broadcast_timer.start()
+                return
+            self._last_broadcast = time.monotonic()
+        self._emit_all_tracks_status()
+
+    def _trailing_broadcast(self):
+        with self._broadcast_lock:
+            self._broadcast_timer = None
+            self._last_broadcast = time.monotonic()
+        self._emit_all_tracks_status()
+
+    def _emit_all_tracks_status(self):
         if self.socketio:
             try:
                 tracks_status = self.get_all_tracks_status()
@@ -513,8 +607,14 @@ class MultiTrackManager:
 class TrackSpecificParser(ApexTimingWebSocketParser):
     """Extended parser that writes to a track-specific database"""
 
+    # lap_times/lap_history rows are buffered across messages and written in
+    # one transaction once this many are pending or this many seconds have
+    # passed since the last write, whichever comes first.
+    WRITE_BATCH_ROWS = 500
+    WRITE_FLUSH_INTERVAL = 1.0
+
     def __init__(self, track_id: int, track_name: str, db_path: str, socketio=None, manager=None):
-        # Set attributes BEFORE calling super().__init__() so setup_database() can use them
+        # Set attributes BEFORE calling super().__init__()
         self.track_id = track_id
         self.track_name = track_name
         self.db_path = db_path
@@ -534,8 +634,7 @@ class TrackSpecificParser(ApexTimingWebSocketParser):
         self.SESSION_GAP_THRESHOLD = 1800
         self.no_session_timeout = 120  # seconds (2 minutes without data = no session)
         self.check_interval = 30  # check every 30 seconds
-        self.monitor_thread = None
-        self.monitor_stop_event = threading.Event()
+        self.monitor_task: Optional[asyncio.Task] = None
 
         # Automatic session detection
         self.current_session_id = None
@@ -549,16 +648,31 @@ class TrackSpecificParser(ApexTimingWebSocketParser):
         self.previous_state_cache = {}
         # Counter for write commits, used to drive periodic cache cleanup.
         self._commit_count = 0
-
-        # Now call parent init which will call setup_database()
+        # Number of teams in the last standings passed to store_lap_data
+        self.teams_count = 0
+        # Rows waiting for the next batched write; see flush_pending_writes.
+        # The lock covers worker threads (store_lap_data, the monitor flush).
+        self._pending_current = []
+        self._pending_history = []
+        self._last_flush = time.monotonic()
+        self._write_lock = threading.Lock()
+        # Loop timer that writes a quiet feed's buffered rows after
+        # WRITE_FLUSH_INTERVAL; armed from store_lap_data (see
+        # _schedule_write_flush). _loop is set by start_session_monitoring.
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._write_flush_handle: Optional[asyncio.TimerHandle] = None
+        self._write_flush_task: Optional[asyncio.Future] = None
+        # run_db calls still queued or running on the manager's pool;
+        # cleanup() waits for them before it closes the connection
+        self._db_futures: Set[Future] = set()
+        # team name -> team_track_<id>_<team> room, built on first emit
+        self._team_rooms: Dict[str, str] = {}
+        # team name -> last team_specific_update payload sent to its room
+        self._last_team_updates: Dict[str, Dict[str, str]] = {}
+
+        # Now call parent init
         super().__init__()
 
-    def setup_database(self):
-        """Override to use track-specific database"""
-        # Database is already initialized by MultiTrackManager
-        # Don't create tables here, just log
-        self.logger.debug(f"Using database: {self.db_path}")
-
     def cleanup_old_cache_sessions(self, keep_last_n=2):
         """Clean up old session data from cache to prevent memory bloat"""
         if len(self.previous_state_cache) > keep_last_n:
@@ -568,22 +682,87 @@ class TrackSpecificParser(ApexTimingWebSocketParser):
             for sid in sessions_to_remove:
                 del self.previous_state_cache[sid]
             if sessions_to_remove:
+                # The roster changes with the session; drop rooms of past teams
+                self._team_rooms.clear()
+                self._last_team_updates.clear()
                 self.logger.debug(f"Track {self.track_id}: Cleaned up {len(sessions_to_remove)} old sessions from cache")
 
-    def start_session_monitoring(self):
-        """Start periodic check for session activity in a background thread"""
-        import time
+    async def run_db(self, func, *args):
+        """Run a blocking DB call (and its emits) off the event loop.
+
+        Uses the manager's shared pool so the worker count stays bounded
+        however many tracks are running; a parser without a manager falls
+        back to asyncio.to_thread.
+        """
+        if self.manager is None:
+            return await asyncio.to_thread(func, *args)
+        future = self.manager.db_executor.submit(func, *args)
+        self._db_futures.add(future)
+        future.add_done_callback(self._db_futures.discard)
+        return await asyncio.wrap_future(future)
+
+    async def wait_for_db_calls(self):
+        """Wait until this parser's run_db calls have left the pool.
+
+        Cancelling the task that awaited one doesn't stop a call already
+        running in the pool, so cleanup waits here before closing self.db.
+        """
+        flush_task, self._write_flush_task = self._write_flush_task, None
+        if flush_task is not None:
+            flush_task.cancel()
+            try:
+                await flush_task
+            except (asyncio.CancelledError, Exception):
+                pass
+        pending = list(self._db_futures)
+        if pending:
+            await asyncio.to_thread(wait_futures, pending)
+
+    async def session_monitor_loop(self):
+        """Periodically check for session activity until cancelled"""
         try:
-            while not self.monitor_stop_event.is_set():
-                # Wait for check_interval seconds or until stop event is set
-                if self.monitor_stop_event.wait(self.check_interval):
-                    break
+            while True:
+                await asyncio.sleep(self.check_interval)
                 self.check_session_status()
+                # Don't leave the tail of a race in the buffer once the
+                # feed goes quiet
+                await self.run_db(self.flush_pending_writes)
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             self.logger.error(f"Error in session monitoring: {e}")
-            import traceback
             self.logger.error(traceback.format_exc())
 
+    def start_session_monitoring(self) -> bool:
+        """Run session_monitor_loop as a task on the running loop.
+
+        A task rather than a thread per track. Returns False if one is
+        already running.
+        """
+        if self.monitor_task is not None and not self.monitor_task.done():
+            return False
+        self._loop = asyncio.get_running_loop()
+        self.monitor_task = asyncio.create_task(
+            self.session_monitor_loop(), name=f"SessionMonitor-Track{self.track_id}"
+        )
+        return True
+
+    async def stop_session_monitoring(self):
+        """Cancel the session monitor task, if any, and wait for it to end"""
+        if self._write_flush_handle is not None:
+            self._write_flush_handle.cancel()
+            self._write_flush_handle = None
+        task, self.monitor_task = self.monitor_task, None
+        if task is None or task.done():
+            return
+        task.cancel()
+        if task.get_loop() is not asyncio.get_running_loop():
+            return
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
     def check_session_status(self):
         """Check if session is active based on data reception"""
         now = datetime.now()
@@ -662,16 +841,8 @@ class TrackSpecificParser(ApexTimingWebSocketParser):
         # Session ID will be determined dynamically based on lap progression
         reconnect_delay = 5
 
-        # Start session monitoring thread
-        if self.monitor_thread is None or not self.monitor_thread.is_alive():
-            self.monitor_stop_event.clear()
-            self.monitor_thread = threading.Thread(
-                target=self.start_session_monitoring,
-                name=f"SessionMonitor-Track{self.track_id}",
-                daemon=True
-            )
-            self.monitor_thread.start()
-            self.logger.info(f"Started session monitoring thread for track {self.track_id} ({self.track_name})")
+        if self.start_session_monitoring():
+            self.logger.info(f"Started session monitoring for track {self.track_id} ({self.track_name})")
 
         # Start WebSocket connection and message loop
         while True:
@@ -692,131 +863,150 @@ class TrackSpecificParser(ApexTimingWebSocketParser):
                 except Exception as e:
                     self.logger.warning(f"Track {self.track_id}: Could not send init message: {e}")
 
-                # Listen for messages
+                # Listen for messages. The reader task only drains the socket
+                # into the queue (as in the base parser), so a slow write
+                # never holds up recv() for this track.
                 self.logger.info(f"Track {self.track_id} ({self.track_name}): Listening for WebSocket messages...")
-                message_count = 0
-                async for message in self.websocket:
-                    message_count += 1
-                    try:
-                        # Log the message at debug level
-                        self.logger.debug(f"Track {self.track_id} WebSocket message #{message_count}: {len(message)} bytes")
-
-                        # Log message content for debugging (sample every 20 messages)
-                        if message_count % 20 == 0:
-                            self.logger.debug(f"Track {self.track_id} message sample: {message[:200]}")
-
-                        # Split message by newlines as it contains multiple commands
-                        lines = message.strip().split('\n')
-
-                        for i, line in enumerate(lines):
-                            if not line.strip():
-                                continue
-
-                            # Parse each command line
-                            parsed = self.parse_websocket_message(line)
-                            if not parsed:
-                                continue
-
-                            command = parsed['command']
-
-                            # Log commands for debugging (sample every 50 messages to avoid spam)
-                            if message_count % 50 == 0 or command == 'update':
-                                self.logger.debug(f"Track {self.track_id}: Command '{command}' param='{parsed.get('parameter', '')}' value_len={len(parsed.get('value', ''))}")
-
-                            # Process different message types
-                            if command == 'init':
-                                self.process_init_message(parsed)
-                            elif command == 'grid':
-                                self.process_grid_message(parsed)
-                            elif command == 'update':
-                                self.process_update_message(parsed)
-                            elif command == 'css':
-                                self.process_css_message(parsed)
-                            elif command == 'title1':
-                                self.session_info['title1'] = parsed['value']
-                            elif command == 'title2':
-                                self.session_info['title2'] = parsed['value']
-                            elif command == 'title':
-                                self.process_title_message(parsed)
-                            elif command == 'clear':
-                                # Clear data for the specified element
-                                if parsed['parameter'] == 'grid':
-                                    self.grid_data.clear()
-                                    self.row_map.clear()
-                            elif command == 'com':
-                                # Comment/info message
-                                self.session_info['comment'] = parsed['value']
-                            elif command == 'msg':
-                                # Message (best lap info etc)
-                                self.session_info['message'] = parsed['value']
-                            elif command == 'track':
-                                # Track info
-                                self.session_info['track'] = parsed['value']
-                            elif command.startswith('r') and 'c' in command:
-                                # This is a cell update command (e.g. r114c10|ti|17.821)
-                                # The cell ID is the command, not a parameter
-                                # Restructure to call process_update_message correctly
-                                self.process_update_message({
-                                    'command': 'update',
-                                    'parameter': command,  # Cell ID like r114c10
-                                    'value': f"{parsed['parameter']}|{parsed['value']}"  # type|value like ti|17.821
-                                })
-
-                        # After processing all lines, store the data
-                        df = self.get_current_standings()
-                        if not df.empty:
-                            # Determine session_id based on leader's lap progression
-                            leader_gap = ''
-                            if 'Position' in df.columns and 'Gap' in df.columns:
-                                leader_row = df[df['Position'].astype(str) == '1']
-                                if not leader_row.empty:
-                                    leader_gap = leader_row.iloc[0].get('Gap', '')
-
-                            session_id = self.check_and_update_session(leader_gap)
-
-                            # Only store data if we have an active session, OR create one for mid-session starts
-                            if session_id is not None:
-                                self.store_lap_data(session_id, df)
-                                self.session_active_status = True
-                                self.last_data_time = datetime.now()
-                            else:
-                                # No session detected - create one automatically for mid-session starts
-                                self.logger.info(f"Track {self.track_id}: No session start detected, creating mid-session session")
-                                session_id = self.create_new_session()
-                                self.current_session_id = session_id
-                                self.current_leader_lap = 1  # Assume racing lap 1 when we start monitoring
-                                self.session_ended = False
-                                self.session_active_status = True
-                                self.last_data_time = datetime.now()
-                                self.store_lap_data(session_id, df)
-
-                    except Exception as e:
-                        self.logger.error(f"Track {self.track_id}: Error processing message: {e}")
-                        import traceback
-                        self.logger.error(traceback.format_exc())
+                self.message_count = 0
+                queue: asyncio.Queue = asyncio.Queue()
+                reader = asyncio.create_task(self._read_messages(queue))
+                try:
+                    await self._process_track_messages(queue)
+                    await reader  # Re-raise whatever ended the connection
+                finally:
+                    reader.cancel()
 
             except Exception as e:
-                import websockets
                 if isinstance(e, websockets.exceptions.ConnectionClosed):
                     self.logger.warning(f"Track {self.track_id}: WebSocket connection closed: {e}")
                 else:
                     self.logger.error(f"Track {self.track_id}: WebSocket error: {e}")
-                    import traceback
                     self.logger.error(traceback.format_exc())
                 self.is_connected = False
                 await asyncio.sleep(reconnect_delay)
 
+    async def _process_track_messages(self, queue: asyncio.Queue):
+        """Apply queued frames, then store once per drained batch.
+
+        Frames are never dropped (each is a delta against the grid); when
+        they pile up behind a slow write, the whole backlog is applied and
+        stored as one tick.
+        """
+        while True:
+            batch = [await queue.get()]
+            while not queue.empty():
+                batch.append(queue.get_nowait())
+            ended = batch[-1] is None
+            if ended:
+                batch.pop()
+
+            for message in batch:
+                try:
+                    self.apply_track_message(message)
+                except Exception as e:
+                    self.logger.error(f"Track {self.track_id}: Error processing message: {e}")
+                    self.logger.error(traceback.format_exc())
+
+            # Liveness is per batch, not per write: frames that change no
+            # grid cell (com/title, an unchanged css) skip the store but
+            # still show the feed is alive to check_session_status
+            if self.grid_data:
+                self.last_data_time = datetime.now()
+
+            try:
+                await self.store_current_standings()
+            except Exception as e:
+                self.logger.error(f"Track {self.track_id}: Error storing standings: {e}")
+                self.logger.error(traceback.format_exc())
+
+            if ended:
+                return
+
+    def apply_track_message(self, message: str):
+        """Apply one WebSocket frame (one or more command lines) to the grid"""
+        self.message_count += 1
+        message_count = self.message_count
+        parse = self.parse_websocket_message
+        handlers = self._command_handlers
+        session_info = self.session_info
+        # Checked once per frame: the per-line logs below would otherwise
+        # format an f-string for every cell update even with DEBUG off
+        debug = self.logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            self.logger.debug(f"Track {self.track_id} WebSocket message #{message_count}: {len(message)} bytes")
+
+            # Log message content for debugging (sample every 20 messages)
+            if message_count % 20 == 0:
+                self.logger.debug(f"Track {self.track_id} message sample: {message[:200]}")
+
+        # Split message by newlines as it contains multiple commands
+        lines = message.strip().split('\n')
+
+        for i, line in enumerate(lines):
+            if not line.strip():
+                continue
+
+            # Parse each command line
+            parsed = parse(line)
+            if not parsed:
+                continue
+
+            command, parameter, value = parsed
+
+            # Log commands for debugging (sample every 50 messages to avoid spam)
+            if debug and (message_count % 50 == 0 or command == 'update'):
+                self.logger.debug(f"Track {self.track_id}: Command '{command}' param='{parameter}' value_len={len(value)}")
+
+            # Same dispatch as process_message; only cell updates differ
+            handler = handlers.get(command)
+            if handler is not None:
+                handler(parameter, value)
+            elif command in SESSION_INFO_COMMANDS:
+                session_info[SESSION_INFO_COMMANDS[command]] = value
+            elif command.startswith('r') and 'c' in command:
+                # This is a cell update command (e.g. r114c10|ti|17.821)
+                # The cell ID is the command, not a parameter, and
+                # the rest is type|value like ti|17.821
+                self.process_update_message(command, f"{parameter}|{value}")
+
+    async def store_current_standings(self):
+        """Store and broadcast the standings if a grid cell changed"""
+        # Only store/broadcast when a grid cell actually changed;
+        # css/com/title-only messages leave the standings as is
+        if not self.dirty_rows:
+            return
+        self.dirty_rows.clear()
+
+        teams = self.get_current_standings()
+        if teams:
+            # Determine session_id based on leader's lap progression
+            session_id = self.check_and_update_session(self.leader_gap(teams))
+
+            # Only store data if we have an active session, OR create one for mid-session starts
+            # The write and its emits run on a worker thread
+            # so other tracks' sockets keep draining meanwhile;
+            # awaiting it keeps this track's writes in order.
+            if session_id is not None:
+                await self.run_db(self.store_lap_data, session_id, teams)
+                self.session_active_status = True
+            else:
+                # No session detected - create one automatically for mid-session starts
+                self.logger.info(f"Track {self.track_id}: No session start detected, creating mid-session session")
+                session_id = self.create_new_session()
+                self.current_session_id = session_id
+                self.current_leader_lap = 1  # Assume racing lap 1 when we start monitoring
+                self.session_ended = False
+                self.session_active_status = True
+                await self.run_db(self.store_lap_data, session_id, teams)
+
     async def connect_websocket(self, ws_url: str):
         """Override to just connect without starting message loop"""
         # Call parent's connect_websocket
         return await super().connect_websocket(ws_url)
 
     async def cleanup(self):
-        """Override cleanup to stop monitoring thread + close the websocket"""
-        # Stop monitoring thread
-        if self.monitor_thread and self.monitor_thread.is_alive():
-            self.monitor_stop_event.set()
-            self.monitor_thread.join(timeout=5)
+        """Override cleanup to stop session monitoring + close the websocket and DB"""
+        await self.stop_session_monitoring()
 
         # Close the websocket explicitly — the base parser assigns self.websocket
         # rather than using an `async with`, so a cancelled task won't close it.
@@ -827,90 +1017,110 @@ class TrackSpecificParser(ApexTimingWebSocketParser):
                 pass
             self.websocket = None
 
+        # A write may still be running on the pool; let it finish before
+        # the parent cleanup flushes what's left and closes the connection
+        await self.wait_for_db_calls()
+
         # Call parent cleanup if it exists
         if hasattr(super(), 'cleanup'):
             await super().cleanup()
 
     def get_db_connection(self):
-        """Get connection to track-specific database with WAL mode and timeout"""
+        """Get the parser's connection to its track database.
+
+        Opened on first use and kept for the parser's lifetime in self.db (the
+        base class's slot), so the page cache stays warm between messages.
+        Autocommit mode: callers that need several statements to land
+        together issue their own BEGIN/COMMIT. Closed by cleanup().
+
+        The connection is shared by the loop thread and run_db workers, so
+        callers hold _write_lock while they use it.
+        """
+        if self.db is not None:
+            return self.db
         try:
-            conn = sqlite3.connect(self.db_path, timeout=5.0)
-            # Enable WAL mode for better concurrent access
-            conn.execute("PRAGMA journal_mode=WAL")
-            # Set busy timeout to 5 seconds
-            conn.execute("PRAGMA busy_timeout=5000")
+            # check_same_thread=False: AlphaHub channels ingest from
+            # run_db worker threads rather than the loop thread.
+            conn = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None,
+                                   check_same_thread=False, cached_statements=256)
+            _configure_connection(conn)
+            self.db = conn
             return conn
         except Exception as e:
             self.logger.error(f"Error connecting to database {self.db_path}: {e}")
             raise
 
-    def store_lap_data(self, session_id: int, df):
+    @staticmethod
+    def leader_gap(teams: List[Dict[str, str]]) -> str:
+        """Gap column of the row in position 1 ('' when there is none)."""
+        for team in teams:
+            if str(team.get('Position', '')) == '1':
+                return team.get('Gap', '')
+        return ''
+
+    def store_lap_data(self, session_id: int, teams: List[Dict[str, str]]):
         """Override to use track-specific database"""
-        if df.empty:
+        if not teams:
             return
 
-        # Update last data time for session monitoring
-        self.last_data_time = datetime.now()
-
-        timestamp = datetime.now().isoformat()
+        # One clock read per tick: session monitoring, every row written and
+        # every emit below share it
+        now = datetime.now()
+        self.last_data_time = now
+        timestamp = now.isoformat()
+        self.teams_count = len(teams)
         current_records = []
         lap_history_records = []
 
         # Get previous state from cache, initialize if needed
         if session_id not in self.previous_state_cache:
-            # First time seeing this session, initialize cache from DB
+            # First time seeing this session, initialize cache from DB.
+            # Buffered rows may belong to it (e.g. its cache entry was
+            # evicted), so land them first.
+            self.flush_pending_writes()
             try:
-                with self.get_db_connection() as conn:
-                    cursor = conn.cursor()
-                    cursor.execute('''
-                        SELECT DISTINCT kart_number, RunTime, position, last_lap, best_lap, pit_stops
+                with self._write_lock:
+                    # One row per kart: SQLite takes the bare columns from the
+                    # MAX(timestamp) row, walking idx_lap_times_session_kart
+                    # instead of sorting the whole session.
+                    rows = self.get_db_connection().execute('''
+                        SELECT kart_number, MAX(timestamp), CAST(RunTime AS INTEGER),
+                               position, last_lap, best_lap, pit_stops
                         FROM lap_times
                         WHERE session_id = ?
-                        ORDER BY timestamp DESC
-                    ''', (session_id,))
-                    rows = cursor.fetchall()
-                    self.previous_state_cache[session_id] = {}
-                    for row in rows:
-                        kart_num, runtime, position_seed, last_lap, best_lap, pit_stops = row
-                        # Only keep the most recent state for each kart
-                        if kart_num not in self.previous_state_cache[session_id]:
-                            self.previous_state_cache[session_id][kart_num] = {
-                                'RunTime': runtime,
-                                'position': position_seed,
-                                'last_lap': last_lap,
-                                'best_lap': best_lap,
-                                'pit_stops': pit_stops
-                            }
-                    self.logger.debug(f"Track {self.track_id}: Initialized cache for session {session_id} with {len(self.previous_state_cache[session_id])} karts")
+                        GROUP BY kart_number
+                    ''', (session_id,)).fetchall()
+                self.previous_state_cache[session_id] = {
+                    kart_num: {
+                        'RunTime': runtime,
+                        'position': position_seed,
+                        'last_lap': last_lap,
+                        'best_lap': best_lap,
+                        'pit_stops': pit_stops
+                    }
+                    for kart_num, _, runtime, position_seed, last_lap, best_lap, pit_stops in rows
+                }
+                self.logger.debug(f"Track {self.track_id}: Initialized cache for session {session_id} with {len(self.previous_state_cache[session_id])} karts")
             except Exception as e:
                 self.logger.warning(f"Track {self.track_id}: Error initializing cache: {e}")
                 self.previous_state_cache[session_id] = {}
 
         previous_state = self.previous_state_cache.get(session_id, {})
 
-        for _, row in df.iterrows():
+        for row in teams:
             try:
-                position = int(row['Position']) if row.get('Position', '').strip() else None
-                kart = int(row['Kart']) if row.get('Kart', '').strip() else None
-                # Parse RunTime from MM:SS format to seconds
-                runtime_str = row.get('RunTime', '0')
-                if ':' in runtime_str:
-                    parts = runtime_str.split(':')
-                    runtime = int(parts[0]) * 60 + int(parts[1])
-                else:
-                    runtime = int(runtime_str) if runtime_str.strip() else 0
+                position_str = row.get('Position', '')
+                kart_str = row.get('Kart', '')
+                position = int(position_str) if position_str.strip() else None
+                kart = int(kart_str) if kart_str.strip() else None
+                runtime = runtime_to_seconds(row.get('RunTime', '0'))
 
-                # Handle Pit Stops - can be count (e.g. "3") or time (e.g. "00:22")
-                pit_stops_str = row.get('Pit Stops', '0').strip()
-                if ':' in pit_stops_str:
-                    # This is pit time in MM:SS format, store as 0 for count
-                    pit_stops = 0
-                else:
-                    # This is a count
-                    pit_stops = int(pit_stops_str) if pit_stops_str and pit_stops_str.isdigit() else 0
+                pit_stops = pit_stops_count(row.get('Pit Stops', '0'))
 
                 last_lap_val = row.get('Last Lap', '')
                 best_lap_val = row.get('Best Lap', '')
+                team_name = row.get('Team', '')
+                prev = previous_state.get(kart) if kart else None
 
                 # Phase: write-dedup. lap_times used to be a per-tick snapshot
                 # (~44M rows per active track in 7 months because most ticks
@@ -919,14 +1129,12 @@ class TrackSpecificParser(ApexTimingWebSocketParser):
                 # team's position, last lap completed, best lap, or pit stop
                 # count. The first sighting of a kart in a session is always
                 # recorded as a baseline.
-                should_record = True
-                if kart and kart in previous_state:
-                    prev = previous_state[kart]
-                    if (position == prev.get('position') and
-                            last_lap_val == prev.get('last_lap') and
-                            best_lap_val == prev.get('best_lap') and
-                            pit_stops == prev.get('pit_stops')):
-                        should_record = False
+                should_record = not (
+                    prev is not None and
+                    position == prev.get('position') and
+                    last_lap_val == prev.get('last_lap') and
+                    best_lap_val == prev.get('best_lap') and
+                    pit_stops == prev.get('pit_stops'))
 
                 if should_record:
                     current_records.append((
@@ -934,7 +1142,7 @@ class TrackSpecificParser(ApexTimingWebSocketParser):
                         timestamp,
                         position,
                         kart,
-                        row.get('Team', ''),
+                        team_name,
                         last_lap_val,
                         best_lap_val,
                         row.get('Gap', ''),
@@ -943,16 +1151,14 @@ class TrackSpecificParser(ApexTimingWebSocketParser):
                     ))
 
                 # Check for new laps using in-memory cache
-                if kart and kart in previous_state:
-                    prev_runtime = previous_state[kart].get('RunTime')
-                    prev_last_lap = previous_state[kart].get('last_lap')
-
-                    if runtime != prev_runtime and last_lap_val and last_lap_val != prev_last_lap:
+                if prev is not None:
+                    if (runtime != prev.get('RunTime') and last_lap_val and
+                            last_lap_val != prev.get('last_lap')):
                         lap_history_records.append((
                             session_id,
                             timestamp,
                             kart,
-                            row.get('Team', ''),
+                            team_name,
                             runtime,
                             last_lap_val,
                             position,
@@ -972,31 +1178,21 @@ class TrackSpecificParser(ApexTimingWebSocketParser):
 
             except Exception as e:
                 self.logger.warning(f"Track {self.track_id}: Error processing row: {e}")
-                self.logger.warning(f"Track {self.track_id}: Row data: {dict(row)}")
-                import traceback
+                self.logger.warning(f"Track {self.track_id}: Row data: {row}")
                 self.logger.warning(f"Track {self.track_id}: Traceback: {traceback.format_exc()}")
                 continue
 
         if current_records:
             try:
-                with self.get_db_connection() as conn:
-                    conn.executemany('''
-                        INSERT INTO lap_times
-                        (session_id, timestamp, position, kart_number, team_name,
-                        last_lap, best_lap, gap, RunTime, pit_stops)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', current_records)
-
-                    if lap_history_records:
-                        conn.executemany('''
-                            INSERT INTO lap_history
-                            (session_id, timestamp, kart_number, team_name,
-                            lap_number, lap_time, position_after_lap, pit_this_lap)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                        ''', lap_history_records)
-
-                    conn.commit()
-                    self.logger.debug(f"Track {self.track_id}: Stored {len(current_records)} records, {len(lap_history_records)} lap history records")
+                with self._write_lock:
+                    self._pending_current.extend(current_records)
+                    self._pending_history.extend(lap_history_records)
+                    pending = len(self._pending_current)
+                if (pending >= self.WRITE_BATCH_ROWS
+                        or time.monotonic() - self._last_flush >= self.WRITE_FLUSH_INTERVAL):
+                    self.flush_pending_writes()
+                else:
+                    self._schedule_write_flush()
 
                 # Periodically clean up old session caches (every 10 commits).
                 # Previously used `session_id % 10 == 0` which triggered at most
@@ -1008,24 +1204,20 @@ class TrackSpecificParser(ApexTimingWebSocketParser):
                 # Broadcast update to Socket.IO room for this track
                 if self.socketio:
                     try:
-                        # Get current standings
-                        standings_df = self.get_current_standings()
-                        if not standings_df.empty:
-                            teams_data = standings_df.to_dict('records')
-
-                            # Emit to track-specific room
-                            room = f'track_{self.track_id}'
-                            self.socketio.emit('track_update', {
-                                'track_id': self.track_id,
-                                'track_name': self.track_name,
-                                'teams': teams_data,
-                                'session_id': session_id,
-                                'timestamp': timestamp
-                            }, room=room)
-                            self.logger.debug(f"Emitted update to room {room} with {len(teams_data)} teams")
-
-                            # Emit team-specific updates to individual team rooms
-                            self.emit_team_specific_updates(standings_df, session_id, timestamp)
+                        # `teams` is the caller's get_current_standings()
+                        # result, so it is emitted as-is rather than rebuilt
+                        room = f'track_{self.track_id}'
+                        self.socketio.emit('track_update', {
+                            'track_id': self.track_id,
+                            'track_name': self.track_name,
+                            'teams': teams,
+                            'session_id': session_id,
+                            'timestamp': timestamp
+                        }, room=room)
+                        self.logger.debug(f"Emitted update to room {room} with {len(teams)} teams")
+
+                        # Emit team-specific updates to individual team rooms
+                        self.emit_team_specific_updates(teams, session_id, timestamp)
 
                     except Exception as emit_error:
                         self.logger.error(f"Error emitting Socket.IO update: {emit_error}")
@@ -1033,50 +1225,119 @@ class TrackSpecificParser(ApexTimingWebSocketParser):
             except Exception as e:
                 self.logger.error(f"Error storing lap data: {e}")
 
-    def emit_team_specific_updates(self, standings_df: pd.DataFrame, session_id: int, timestamp: str):
+    def _schedule_write_flush(self):
+        """Have the loop flush the buffer WRITE_FLUSH_INTERVAL from now.
+
+        Without it a feed that goes quiet would leave its last rows unwritten
+        until the next session monitor tick. Safe from run_db workers.
+        """
+        loop = self._loop
+        if loop is None or self._write_flush_handle is not None:
+            return
+        try:
+            loop.call_soon_threadsafe(self._arm_write_flush)
+        except RuntimeError:
+            pass  # Loop already closed; close() flushes instead
+
+    def _arm_write_flush(self):
+        if self._write_flush_handle is None:
+            self._write_flush_handle = self._loop.call_later(
+                self.WRITE_FLUSH_INTERVAL, self._write_flush_due
+            )
+
+    def _write_flush_due(self):
+        self._write_flush_handle = None
+        self._write_flush_task = asyncio.ensure_future(self.run_db(self.flush_pending_writes))
+
+    def flush_pending_writes(self):
+        """Write buffered lap_times/lap_history rows in one transaction.
+
+        On failure the rows go back to the front of the buffer for the next
+        flush: previous_state_cache already counts them as written, so they
+        would never be recorded again otherwise.
+        """
+        with self._write_lock:
+            current, self._pending_current = self._pending_current, []
+            history, self._pending_history = self._pending_history, []
+            self._last_flush = time.monotonic()
+            if not current:
+                return
+            try:
+                conn = self.get_db_connection()
+                # Both tables land in one transaction (one WAL commit)
+                conn.execute('BEGIN')
+                try:
+                    conn.executemany(SQL_INSERT_LAP_TIMES, current)
+                    if history:
+                        conn.executemany(SQL_INSERT_LAP_HISTORY, history)
+
+                    conn.execute('COMMIT')
+                except Exception:
+                    if conn.in_transaction:
+                        conn.execute('ROLLBACK')
+                    raise
+                self.logger.debug(f"Track {self.track_id}: Stored {len(current)} records, {len(history)} lap history records")
+            except Exception as e:
+                self._pending_current[:0] = current
+                self._pending_history[:0] = history
+                self.logger.error(f"Error storing lap data ({len(current)} rows kept for retry): {e}")
+
+    def close(self):
+        """Flush buffered lap rows, then close the track database"""
+        self.flush_pending_writes()
+        with self._write_lock:
+            super().close()
+
+    def emit_team_specific_updates(self, teams: List[Dict[str, str]], session_id: int, timestamp: str):
         """
         Emit team-specific updates to individual team rooms.
         Each team gets position, gap to leader, relative gaps to front/behind,
         lap times, pit stops, and status.
         """
-        if not self.socketio or standings_df.empty:
+        if not self.socketio or not teams:
             return
 
         try:
-            teams = standings_df.to_dict('records')
-
-            def parse_gap(gap_string):
-                """Convert gap string like '+12.456' or '12.456' to float"""
-                if not gap_string or gap_string in ('LEADER', 'Leader', ''):
-                    return 0.0
-                try:
-                    return float(gap_string.replace('+', '').strip())
-                except (ValueError, AttributeError):
-                    return 0.0
+            # Every gap is needed up to three times (own, and as the front /
+            # behind neighbour's), so parse each one once up front
+            gaps = [_parse_gap(team.get('Gap', '')) for team in teams]
+            last_idx = len(teams) - 1
+            # Socket.IO encodes an event even when its room is empty, and
+            # most teams have nobody watching, so only emit to occupied rooms
+            rooms = _socketio_rooms(self.socketio)
+            team_rooms = self._team_rooms
+            last_updates = self._last_team_updates
+            track_id = self.track_id
+            emit = self.socketio.emit
 
             for idx, team in enumerate(teams):
                 team_name = team.get('Team', '')
                 if not team_name:
                     continue
+                room = team_rooms.get(team_name)
+                if room is None:
+                    room = team_rooms[team_name] = f'team_track_{track_id}_{team_name}'
+                if rooms is not None and not rooms.get(room):
+                    continue
 
-                position_str = team.get('Position', '')
-                position = int(position_str) if position_str and str(position_str).isdigit() else idx + 1
+                try:
+                    position = int(team.get('Position', ''))
+                except (TypeError, ValueError):
+                    position = idx + 1
+                if position < 1:
+                    position = idx + 1
                 gap_str = team.get('Gap', '')
-                current_gap = parse_gap(gap_str)
+                current_gap = gaps[idx]
 
                 # Gap to front: difference between our gap-to-leader and front car's gap-to-leader
                 if position > 1 and idx > 0:
-                    front_gap = parse_gap(teams[idx - 1].get('Gap', ''))
-                    diff = current_gap - front_gap
-                    gap_to_front = f"{diff:.3f}"
+                    gap_to_front = f"{current_gap - gaps[idx - 1]:.3f}"
                 else:
                     gap_to_front = '-'
 
                 # Gap to behind: difference between behind car's gap-to-leader and ours
-                if idx < len(teams) - 1:
-                    behind_gap = parse_gap(teams[idx + 1].get('Gap', ''))
-                    diff = behind_gap - current_gap
-                    gap_to_behind = f"{diff:.3f}"
+                if idx < last_idx:
+                    gap_to_behind = f"{gaps[idx + 1] - current_gap:.3f}"
                 else:
                     gap_to_behind = '-'
 
@@ -1091,12 +1352,21 @@ class TrackSpecificParser(ApexTimingWebSocketParser):
                     'Status': team.get('Status', 'On Track'),
                 }
 
-                room = f'team_track_{self.track_id}_{team_name}'
-                self.socketio.emit('team_specific_update', team_update, room=room)
+                # Stationary or paused teams produce the same payload tick
+                # after tick; their subscribers already have it
+                if last_updates.get(team_name) == team_update:
+                    continue
+                last_updates[team_name] = team_update
+                emit('team_specific_update', team_update, room=room)
 
         except Exception as e:
             self.logger.error(f"Error emitting team-specific updates: {e}")
 
+    def forget_team_update(self, team_name: str):
+        """Make the next emit send team_name's update even if unchanged,
+        so a client that just joined its room isn't left waiting."""
+        self._last_team_updates.pop(team_name, None)
+
     def extract_lap_number(self, gap_value: str) -> Optional[int]:
         """Extract lap number from gap field (e.g., 'Tour 5' -> 5)"""
         if not gap_value:
@@ -1198,22 +1468,18 @@ class TrackSpecificParser(ApexTimingWebSocketParser):
     def create_new_session(self) -> int:
         """Create a new session and return its ID"""
         try:
-            with self.get_db_connection() as conn:
-                cursor = conn.cursor()
+            timestamp = datetime.now().isoformat()
+            session_name = f"{self.track_name} - {datetime.now().strftime('%Y-%m-%d %H:%M')}"
 
-                timestamp = datetime.now().isoformat()
-                session_name = f"{self.track_name} - {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+            # The connection is shared with run_db workers; the lock keeps
+            # this autocommit INSERT out of a flush's open transaction
+            with self._write_lock:
+                session_id = self.get_db_connection().execute(
+                    SQL_INSERT_SESSION, (timestamp, session_name, self.track_name)
+                ).lastrowid
 
-                cursor.execute('''
-                    INSERT INTO race_sessions (start_time, name, track)
-                    VALUES (?, ?, ?)
-                ''', (timestamp, session_name, self.track_name))
-
-                session_id = cursor.lastrowid
-                conn.commit()
-
-                self.logger.info(f"Track {self.track_id}: Created new session {session_id}: {session_name}")
-                return session_id
+            self.logger.info(f"Track {self.track_id}: Created new session {session_id}: {session_name}")
+            return session_id
 
         except Exception as e:
             self.logger.error(f"Track {self.track_id}: Error creating new session: {e}")
@@ -1222,32 +1488,25 @@ class TrackSpecificParser(ApexTimingWebSocketParser):
     def create_or_get_session(self, session_name: str, track_name: str) -> int:
         """Override to use track-specific database"""
         try:
-            with self.get_db_connection() as conn:
-                cursor = conn.cursor()
+            with self._write_lock:
+                conn = self.get_db_connection()
 
                 # Check if there's an active session
-                cursor.execute('''
-                    SELECT session_id FROM race_sessions
-                    WHERE name = ? AND track = ?
-                    ORDER BY session_id DESC LIMIT 1
-                ''', (session_name, track_name))
-
-                result = cursor.fetchone()
+                result = conn.execute(SQL_SELECT_SESSION_BY_NAME, (session_name, track_name)).fetchone()
 
                 if result:
                     session_id = result[0]
-                    self.logger.info(f"Using existing session {session_id}")
                 else:
                     # Create new session
-                    cursor.execute('''
-                        INSERT INTO race_sessions (start_time, name, track)
-                        VALUES (?, ?, ?)
-                    ''', (datetime.now().isoformat(), session_name, track_name))
-                    session_id = cursor.lastrowid
-                    conn.commit()
-                    self.logger.info(f"Created new session {session_id}")
-
-                return session_id
+                    session_id = conn.execute(
+                        SQL_INSERT_SESSION, (datetime.now().isoformat(), session_name, track_name)
+                    ).lastrowid
+
+            if result:
+                self.logger.info(f"Using existing session {session_id}")
+            else:
+                self.logger.info(f"Created new session {session_id}")
+            return session_id
         except Exception as e:
             self.logger.error(f"Error creating/getting session: {e}")
             return 1  # Fallback
@@ -16,12 +16,20 @@ import sqlite3
 from functools import wraps
 
 import bcrypt
+import pandas as pd
 from flask import Flask, has_request_context, jsonify, request, session
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit, join_room, leave_room
 from werkzeug.middleware.proxy_fix import ProxyFix
 
-from apex_timing_websocket import ApexTimingWebSocketParser
+try:
+    # Optional: faster Socket.IO payload encoding (track_update fires on every
+    # timing tick for every track). Falls back to the stdlib json module.
+    import orjson
+except ImportError:  # pragma: no cover - depends on the install
+    orjson = None
+
+from apex_timing_websocket import ApexTimingWebSocketParser, new_event_loop
 from database_manager import TrackDatabase
 from email_service import (
     get_email_sender,
@@ -72,6 +80,26 @@ CORS(app,
      allow_headers=["Content-Type", "Authorization", "X-CSRF-Token"],
      methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
 
+
+class _SocketIOJSON:
+    """json-module stand-in for python-socketio's packet encoder, backed by
+    orjson. Anything orjson refuses is handed to the stdlib encoder so a
+    payload never fails to send just because of the faster path."""
+
+    _OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) if orjson else 0
+
+    @staticmethod
+    def dumps(obj, **kwargs):
+        try:
+            return orjson.dumps(obj, option=_SocketIOJSON._OPTIONS).decode()
+        except TypeError:
+            return json.dumps(obj, **kwargs)
+
+    @staticmethod
+    def loads(s, **kwargs):
+        return orjson.loads(s)
+
+
 # Initialize SocketIO — mirror the HTTP CORS whitelist (no wildcards).
 socketio = SocketIO(
     app,
@@ -80,7 +108,8 @@ socketio = SocketIO(
     logger=False,
     engineio_logger=False,
     ping_interval=25,  # Send ping every 25 seconds
-    ping_timeout=60    # Wait 60 seconds for pong response
+    ping_timeout=60,   # Wait 60 seconds for pong response
+    json=_SocketIOJSON if orjson is not None else json,
 )
 
 
@@ -309,8 +338,7 @@ def handle_join_track(data):
         if multi_track_manager and track_id in multi_track_manager.parsers:
             parser = multi_track_manager.parsers[track_id]
             if hasattr(parser, 'get_current_standings'):
-                standings_df = parser.get_current_standings()
-                teams_data = standings_df.to_dict('records') if not standings_df.empty else []
+                teams_data = parser.get_current_standings()
                 emit('track_update', {
                     'track_id': track_id,
                     'track_name': getattr(parser, 'track_name', None),
@@ -410,6 +438,13 @@ def handle_join_team_room(data):
         join_room(room)
         print(f"Client {request.sid} joined team room: {room}")
 
+        # Unchanged team updates are skipped, so have the next tick resend
+        # this team's so the new member gets one
+        if multi_track_manager and track_id in multi_track_manager.parsers:
+            parser = multi_track_manager.parsers[track_id]
+            if hasattr(parser, 'forget_team_update'):
+                parser.forget_team_update(team_name)
+
         # Send confirmation with team and track info
         emit('team_room_joined', {
             'track_id': track_id,
@@ -1555,9 +1590,9 @@ async def update_race_data():
             except asyncio.CancelledError:
                 pass
         
-        # Disconnect WebSocket
+        # Disconnect WebSocket and close the parser's database connection
         if parser:
-            await parser.disconnect_websocket()
+            await parser.cleanup()
         print("Background update thread stopped")
 
 # Start the background update process
@@ -1569,7 +1604,7 @@ def start_update_thread():
     
     # Define a wrapper function for asyncio
     def run_async_loop():
-        loop = asyncio.new_event_loop()
+        loop = new_event_loop()
         asyncio.set_event_loop(loop)
         try:
             loop.run_until_complete(update_race_data())
@@ -3596,12 +3631,13 @@ def _live_session_id(track_id):
 
 def _live_standings_df(track_id):
     """Current standings DataFrame from the live parser (for location/holder),
-    or None when the parser isn't running or has no data."""
+    or None when the parser isn't running or has no data. Parsers hand back
+    plain row dicts; the DataFrame is only built here for the fleet layer."""
     try:
         if multi_track_manager and track_id in multi_track_manager.parsers:
-            df = multi_track_manager.parsers[track_id].get_current_standings()
-            if df is not None and not df.empty:
-                return df
+            teams = multi_track_manager.parsers[track_id].get_current_standings()
+            if teams:
+                return pd.DataFrame(teams)
     except Exception:
         pass
     return None
@@ -3890,7 +3926,7 @@ def start_multi_track_monitoring():
         """Run the async event loop for multi-track monitoring"""
         global multi_track_loop, multi_track_manager
 
-        multi_track_loop = asyncio.new_event_loop()
+        multi_track_loop = new_event_loop()
         asyncio.set_event_loop(multi_track_loop)
 
         multi_track_manager = MultiTrackManager(socketio=socketio)
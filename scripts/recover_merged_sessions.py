@@ -24,19 +24,21 @@ MIN_BURST_MINS = 5      # discard fragments shorter than this
 
 
 def detect_bursts(rows):
-    """Walk chronological lap_times rows. Yield (start_ts, end_ts) for each burst.
+    """Walk chronological lap_times rows.
 
-    rows: list of (timestamp, team_name, last_lap), already sorted by timestamp.
+    rows: iterable of (timestamp, team_name, last_lap), already sorted by
+    timestamp. It is consumed in a single pass, so a live cursor works.
+    Returns (bursts, n_rows): one (start_ts, end_ts, duration_min) per burst,
+    and the number of rows consumed.
     """
-    if not rows:
-        return []
-
     # Per-minute novelty: count new (team, last_lap) pairs first seen that minute.
     seen = set()
     minute_new_count = {}
     minute_first_ts = {}
     minute_last_ts = {}
+    n_rows = 0
     for ts, team, lap in rows:
+        n_rows += 1
         if not team or not lap:
             continue
         m = ts[:16]  # 'YYYY-MM-DDTHH:MM'
@@ -49,7 +51,7 @@ def detect_bursts(rows):
         minute_last_ts[m] = ts
 
     if not minute_new_count:
-        return []
+        return [], n_rows
 
     # Walk minutes contiguously between first and last; missing minutes count
     # as idle (parser was offline).
@@ -80,7 +82,7 @@ def detect_bursts(rows):
         bursts.append(_finalize_burst(current, minute_first_ts, minute_last_ts))
 
     # Apply minimum-duration filter
-    return [b for b in bursts if b is not None and b[2] >= MIN_BURST_MINS]
+    return [b for b in bursts if b is not None and b[2] >= MIN_BURST_MINS], n_rows
 
 
 def _finalize_burst(state, first_ts, last_ts):
@@ -103,13 +105,15 @@ def get_excluded_sessions(conn):
 
 
 def fetch_session_rows(conn, session_id):
+    """Cursor over a session's lap rows; iterate it rather than fetchall()
+    so merged multi-race sessions don't have to fit in memory."""
     return conn.execute("""
         SELECT timestamp, team_name, last_lap FROM lap_times
         WHERE session_id = ?
           AND last_lap IS NOT NULL AND last_lap != ''
           AND team_name IS NOT NULL AND team_name != ''
         ORDER BY timestamp ASC
-    """, (session_id,)).fetchall()
+    """, (session_id,))
 
 
 def apply_recovery(conn, source_sid, source_name, track_name, bursts):
@@ -152,6 +156,11 @@ def main():
 
     db_path = f'race_data_track_{args.track}.db'
     with sqlite3.connect(db_path) as conn:
+        # The server keeps writing this file while we run: match its WAL mode,
+        # skip the per-commit full fsync, and wait out its write locks.
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA busy_timeout=30000')
         excluded = get_excluded_sessions(conn)
         if args.session is not None:
             excluded = [e for e in excluded if e[0] == args.session]
@@ -161,9 +170,8 @@ def main():
         print(f'Track {args.track}: {len(excluded)} excluded session(s) to process')
         total_recovered = 0
         for sid, name, track in excluded:
-            rows = fetch_session_rows(conn, sid)
-            bursts = detect_bursts(rows)
-            print(f'\nsession #{sid} ({len(rows):>8} lap_times rows): detected {len(bursts)} burst(s)')
+            bursts, n_rows = detect_bursts(fetch_session_rows(conn, sid))
+            print(f'\nsession #{sid} ({n_rows:>8} lap_times rows): detected {len(bursts)} burst(s)')
             for start, end, dur in bursts:
                 print(f'    {start[:19]} → {end[:19]}   duration={dur:>6.1f}m')
             if args.apply and bursts:
@@ -174,6 +182,10 @@ def main():
                           f'lap_history rows reassigned: {c["lap_history_rows"]}')
                 total_recovered += len(created)
         if args.apply:
+            if total_recovered:
+                # Reassignment reshuffles lap_times/lap_history session_ids;
+                # refresh planner stats the app's session queries rely on.
+                conn.execute('PRAGMA optimize')
             print(f'\nTotal recovered sessions: {total_recovered}')
 
 
@@ -18,7 +18,6 @@ import sys
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
-import pandas as pd
 import pytest
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
@@ -197,9 +196,8 @@ class TestEventDispatch:
 class TestChannelSurface:
     def test_get_current_standings_empty_when_no_data(self, fresh_db_paths):
         ch = _make_channel(fresh_db_paths, 701, 'buckmore')
-        df = ch.get_current_standings()
-        assert isinstance(df, pd.DataFrame)
-        assert df.empty
+        teams = ch.get_current_standings()
+        assert teams == []
 
     def test_get_current_standings_builds_rows_from_competitors(self, fresh_db_paths):
         ch = _make_channel(fresh_db_paths, 701, 'buckmore')
@@ -211,10 +209,10 @@ class TestChannelSurface:
                   'NumberOfLaps': 10, 'LastLaptime': 76000, 'BestLaptime': 75000,
                   'TakenChequered': False, 'InPit': True},
         }
-        df = ch.get_current_standings()
-        assert list(df['Kart']) == ['6', '7']
-        assert list(df['Status']) == ['On Track', 'Pit-in']
-        assert df.iloc[0]['Last Lap'] == '1:15.000'
+        teams = ch.get_current_standings()
+        assert [t['Kart'] for t in teams] == ['6', '7']
+        assert [t['Status'] for t in teams] == ['On Track', 'Pit-in']
+        assert teams[0]['Last Lap'] == '1:15.000'
 
     def test_apply_delta_merges_in_place(self, fresh_db_paths):
         ch = _make_channel(fresh_db_paths, 701, 'buckmore')
@@ -276,7 +274,7 @@ class TestChannelSurface:
         ch = _make_channel(fresh_db_paths, 701, 'buckmore')
         for attr in ('track_name', 'is_connected', 'session_active_status',
                      'last_data_time', 'current_session_id',
-                     'get_current_standings', 'cleanup'):
+                     'get_current_standings', 'teams_count', 'cleanup'):
             assert hasattr(ch, attr), f"channel missing required attr {attr!r}"
 
 
@@ -1,5 +1,5 @@
 """Unit tests for the AlphaHub parser: format helpers, snapshot/delta merge,
-standings DataFrame, config discovery, and channel-name construction.
+standings rows, config discovery, and channel-name construction.
 
 These tests touch zero network: discover_config takes a fake `requests.Session`,
 and the snapshot/delta methods are exercised by setting `parser._cfg` + a
@@ -14,7 +14,6 @@ import sqlite3
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
-import pandas as pd
 import pytest
 
 
@@ -288,7 +287,7 @@ class TestDiscoverConfig:
 
 
 # ---------------------------------------------------------------------------
-# Snapshot ingest + delta merge + standings DataFrame
+# Snapshot ingest + delta merge + standings rows
 # ---------------------------------------------------------------------------
 
 @pytest.fixture
@@ -312,10 +311,9 @@ def parser(tmp_path: Path) -> AlphaHubParser:
 
 
 class TestStandingsBuild:
-    def test_empty_state_returns_empty_dataframe(self, parser: AlphaHubParser):
-        df = parser.get_current_standings()
-        assert isinstance(df, pd.DataFrame)
-        assert df.empty
+    def test_empty_state_returns_empty_list(self, parser: AlphaHubParser):
+        teams = parser.get_current_standings()
+        assert teams == []
 
     def test_full_row_mapping(self, parser: AlphaHubParser):
         parser.competitors = {
@@ -344,9 +342,9 @@ class TestStandingsBuild:
                 'InPit': True,
             },
         }
-        df = parser.get_current_standings()
-        assert list(df['Kart']) == ['17', '23']
-        leader = df.iloc[0]
+        teams = parser.get_current_standings()
+        assert [t['Kart'] for t in teams] == ['17', '23']
+        leader = teams[0]
         assert leader['Team'] == 'Team Alpha'
         assert leader['Position'] == '1'
         assert leader['Last Lap'] == '1:14.099'
@@ -355,7 +353,7 @@ class TestStandingsBuild:
         assert leader['RunTime'] == '21:00'
         assert leader['Pit Stops'] == '2'
         assert leader['Status'] == 'On Track'
-        second = df.iloc[1]
+        second = teams[1]
         assert second['Gap'] == '+2.345'
         assert second['Status'] == 'Pit-in'      # InPit=True wins over Status
 
@@ -367,8 +365,8 @@ class TestStandingsBuild:
                   'CompetitorName': 'Lapped', 'BestLaptime': 61000,
                   'LapsToFirst': 2, 'GapToFirst': 0},
         }
-        df = parser.get_current_standings()
-        assert df.iloc[1]['Gap'] == 'Tour 2'
+        teams = parser.get_current_standings()
+        assert teams[1]['Gap'] == 'Tour 2'
 
     def test_sorted_by_position(self, parser: AlphaHubParser):
         parser.competitors = {
@@ -376,8 +374,8 @@ class TestStandingsBuild:
             'B': {'CompetitorNumber': 'B', 'Position': 1, 'CompetitorName': 'A'},
             'C': {'CompetitorNumber': 'C', 'Position': 3, 'CompetitorName': 'C'},
         }
-        df = parser.get_current_standings()
-        assert list(df['Position']) == ['1', '3', '5']
+        teams = parser.get_current_standings()
+        assert [t['Position'] for t in teams] == ['1', '3', '5']
 
     def test_alpha_prefixed_kart_number(self, parser: AlphaHubParser):
         # Whilton Mill style: CompetitorNumber like "C1" must produce a
@@ -391,15 +389,15 @@ class TestStandingsBuild:
                     'CompetitorName': 'CADET 12', 'LastLaptime': 34100,
                     'BestLaptime': 33950, 'NumberOfLaps': 7},
         }
-        df = parser.get_current_standings()
+        teams = parser.get_current_standings()
         # Kart values are integers (no "C" prefix) and they're distinct.
-        karts = [int(k) for k in df['Kart']]
+        karts = [int(t['Kart']) for t in teams]
         assert all(k >= 1_000_000 for k in karts)
         assert karts[0] != karts[1]
         # Team carries the original label so the user can still see "C1".
-        assert df.iloc[0]['Team'].startswith('C1 - ')
-        assert 'CADET 1' in df.iloc[0]['Team']
-        assert df.iloc[1]['Team'].startswith('C12 - ')
+        assert teams[0]['Team'].startswith('C1 - ')
+        assert 'CADET 1' in teams[0]['Team']
+        assert teams[1]['Team'].startswith('C12 - ')
 
     def test_numeric_kart_does_not_get_prepended(self, parser: AlphaHubParser):
         # Buckmore-style numeric ID must keep Team clean (no "17 - " prefix).
@@ -407,30 +405,30 @@ class TestStandingsBuild:
             '17': {'CompetitorNumber': 17, 'Position': 1,
                    'CompetitorName': 'Team Alpha', 'LastLaptime': 75000},
         }
-        df = parser.get_current_standings()
-        assert df.iloc[0]['Team'] == 'Team Alpha'
-        assert df.iloc[0]['Kart'] == '17'
+        teams = parser.get_current_standings()
+        assert teams[0]['Team'] == 'Team Alpha'
+        assert teams[0]['Kart'] == '17'
 
     def test_finished_competitors_get_finished_status(self, parser: AlphaHubParser):
         # The exact failure mode the user hit: a post-race Buckmore snapshot
         # has every competitor with TakenChequered=True. They must all read
-        # 'Finished' in the standings DF, not 'On Track'.
+        # 'Finished' in the standings, not 'On Track'.
         parser.competitors = {
             '6': {'CompetitorNumber': 6, 'Position': 1, 'CompetitorName': 'A',
                   'NumberOfLaps': 12, 'TakenChequered': True, 'InPit': False},
             '12': {'CompetitorNumber': 12, 'Position': 2, 'CompetitorName': 'B',
                    'NumberOfLaps': 12, 'TakenChequered': True, 'InPit': False},
         }
-        df = parser.get_current_standings()
-        assert list(df['Status']) == ['Finished', 'Finished']
+        teams = parser.get_current_standings()
+        assert [t['Status'] for t in teams] == ['Finished', 'Finished']
 
     def test_retired_competitor_status(self, parser: AlphaHubParser):
         parser.competitors = {
             '1': {'CompetitorNumber': 1, 'Position': 1, 'CompetitorName': 'A',
                   'Retired': True},
         }
-        df = parser.get_current_standings()
-        assert df.iloc[0]['Status'] == 'Retired'
+        teams = parser.get_current_standings()
+        assert teams[0]['Status'] == 'Retired'
 
     def test_mixed_status_within_session(self, parser: AlphaHubParser):
         # Realistic mid-race mix: one finished, one retired, one in pits,
@@ -444,16 +442,16 @@ class TestStandingsBuild:
             '4': {'CompetitorNumber': 4, 'Position': 4, 'CompetitorName': 'DNF',
                   'Retired': True},
         }
-        df = parser.get_current_standings()
-        assert list(df['Status']) == ['Finished', 'Pit-in', 'On Track', 'Retired']
+        teams = parser.get_current_standings()
+        assert [t['Status'] for t in teams] == ['Finished', 'Pit-in', 'On Track', 'Retired']
 
     def test_alpha_kart_without_team_name(self, parser: AlphaHubParser):
         # Edge case: alpha ID + missing team — Team falls back to bare ID.
         parser.competitors = {
             'C1': {'CompetitorNumber': 'C1', 'Position': 1},
         }
-        df = parser.get_current_standings()
-        assert df.iloc[0]['Team'] == 'C1'
+        teams = parser.get_current_standings()
+        assert teams[0]['Team'] == 'C1'
 
     def test_alt_field_names(self, parser: AlphaHubParser):
         # Some venues use TeamName/Rank/Laps/TotalTime/NumberOfPitStops instead.
@@ -470,8 +468,8 @@ class TestStandingsBuild:
                 'NumberOfPitStops': 1,
             },
         }
-        df = parser.get_current_standings()
-        row = df.iloc[0]
+        teams = parser.get_current_standings()
+        row = teams[0]
         assert row['Team'] == 'Alt'
         assert row['Last Lap'] == '1:20.000'
         assert row['Best Lap'] == '1:19.000'
@@ -0,0 +1,183 @@
+"""TrackDatabase (tracks.db): connection pool, schema setup, batched and
+partial writes, and the data_version-checked read cache.
+
+The pusher_* columns have their own module in test_alphahub.
+"""
+
+import sqlite3
+
+import pytest
+
+from database_manager import TrackDatabase
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A fresh tracks.db under tmp_path, never the working copy's."""
+    monkeypatch.chdir(tmp_path)
+    database = TrackDatabase(db_path=str(tmp_path / 'tracks.db'))
+    yield database
+    database.close()
+
+
+class TestSchema:
+    def test_fresh_db_uses_wal_journal(self, db):
+        with sqlite3.connect(db.db_path) as c:
+            assert c.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+
+    def test_schema_version_is_stamped_and_short_circuits(self, db):
+        with sqlite3.connect(db.db_path) as c:
+            assert c.execute('PRAGMA user_version').fetchone()[0] == TrackDatabase.SCHEMA_VERSION
+            # A stamped file skips the DDL block entirely on the next open
+            c.execute('DROP TRIGGER update_tracks_timestamp')
+        TrackDatabase(db_path=db.db_path).close()
+        with sqlite3.connect(db.db_path) as c:
+            assert c.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'update_tracks_timestamp'"
+            ).fetchone() is None
+
+    def test_active_track_listing_uses_covering_index(self, db):
+        with sqlite3.connect(db.db_path) as c:
+            plan = c.execute(
+                'EXPLAIN QUERY PLAN SELECT id, track_name FROM tracks WHERE is_active = 1'
+            ).fetchall()
+        assert 'COVERING INDEX idx_tracks_name_active' in plan[0][3]
+
+
+class TestConnectionPool:
+    def test_connection_is_reused_across_calls(self, db):
+        with db._conn() as first:
+            pass
+        with db._conn() as second:
+            pass
+        assert first is second
+
+    def test_new_connections_run_pragma_optimize(self, db, monkeypatch):
+        statements = []
+        real_connect = sqlite3.connect
+
+        def tracing_connect(*args, **kwargs):
+            conn = real_connect(*args, **kwargs)
+            conn.set_trace_callback(statements.append)
+            return conn
+
+        monkeypatch.setattr(sqlite3, 'connect', tracing_connect)
+        with db._conn(), db._conn():
+            pass
+        assert statements.count('PRAGMA optimize=0x10002') == 1
+
+    def test_row_factory_does_not_leak_back_into_pool(self, db):
+        db.add_track('Zolder', 'https://example.test/zolder')
+        db.get_all_tracks()
+        with db._conn() as conn:
+            assert conn.row_factory is None
+
+    def test_failed_unit_of_work_is_rolled_back(self, db):
+        with pytest.raises(RuntimeError):
+            with db._conn() as conn:
+                conn.execute(
+                    "INSERT INTO tracks (track_name, timing_url) VALUES ('X', 'u')"
+                )
+                raise RuntimeError('boom')
+        assert db.get_all_tracks() == []
+
+    def test_schema_is_marked_ready_after_init(self, db):
+        assert db._schema_ready is True
+
+
+class TestAddTracks:
+    def test_batch_insert_round_trips(self, db):
+        res = db.add_tracks([
+            {'track_name': 'A', 'timing_url': 'https://example.test/a'},
+            {'track_name': 'B', 'timing_url': 'https://example.test/b',
+             'column_mappings': {'kart': 2}, 'provider': 'alphahub'},
+        ])
+        assert res['added'] == 2
+        by_name = {t['track_name']: t for t in db.get_all_tracks()}
+        assert by_name['B']['column_mappings'] == {'kart': 2}
+        assert by_name['B']['provider'] == 'alphahub'
+        assert by_name['A']['provider'] == 'apex'
+
+    def test_duplicate_rolls_back_whole_batch(self, db):
+        res = db.add_tracks([
+            {'track_name': 'A', 'timing_url': 'u'},
+            {'track_name': 'A', 'timing_url': 'u'},
+        ])
+        assert 'error' in res
+        assert db.get_all_tracks() == []
+
+    def test_skip_existing_leaves_out_known_names(self, db):
+        db.add_track('A', 'old')
+        res = db.add_tracks([
+            {'track_name': 'A', 'timing_url': 'new'},
+            {'track_name': 'B', 'timing_url': 'u'},
+        ], skip_existing=True)
+        assert res['added'] == 1
+        by_name = {t['track_name']: t['timing_url'] for t in db.get_all_tracks()}
+        assert by_name == {'A': 'old', 'B': 'u'}
+        assert db.add_tracks([{'track_name': 'B', 'timing_url': 'u'}], skip_existing=True)['added'] == 0
+
+
+class TestUpdateTrack:
+    def test_partial_update_leaves_other_columns(self, db):
+        res = db.add_track('A', 'https://example.test/a', location='Genk',
+                                 column_mappings={'kart': 'c3'})
+        assert 'message' in db.update_track(res['id'], description='new')
+        track = db.get_track_by_id(res['id'])
+        assert track['description'] == 'new'
+        assert track['location'] == 'Genk'
+        assert track['column_mappings'] == {'kart': 'c3'}
+
+    def test_no_fields_and_unknown_track(self, db):
+        res = db.add_track('A', 'u')
+        assert db.update_track(res['id']) == {'error': 'No fields to update'}
+        assert db.update_track(9999, location='x') == {'error': 'Track not found'}
+
+
+class TestReadCache:
+    def test_repeated_reads_are_served_from_cache(self, db):
+        res = db.add_track('A', 'u')
+        db.get_all_tracks()
+        db.get_track_by_id(res['id'])
+        assert db._all_tracks_cache is not None
+        assert res['id'] in db._track_cache
+
+    def test_callers_get_copies(self, db):
+        res = db.add_track('A', 'u')
+        db.get_track_by_id(res['id'])['track_name'] = 'mutated'
+        db.get_all_tracks()[0]['track_name'] = 'mutated'
+        assert db.get_track_by_id(res['id'])['track_name'] == 'A'
+        assert db.get_all_tracks()[0]['track_name'] == 'A'
+
+    def test_write_through_another_connection_invalidates(self, db):
+        res = db.add_track('A', 'u')
+        assert db.get_track_by_id(res['id'])['location'] is None
+        with sqlite3.connect(db.db_path) as c:
+            c.execute("UPDATE tracks SET location = 'Genk' WHERE id = ?", (res['id'],))
+        assert db.get_track_by_id(res['id'])['location'] == 'Genk'
+        assert db.get_all_tracks()[0]['location'] == 'Genk'
+
+    def test_rows_read_across_a_commit_are_not_cached(self, db):
+        db.add_track('A', 'u')
+        read_rows = db._tracks_from_rows
+
+        def racing_read(rows):
+            tracks = list(read_rows(rows))
+            # Another writer commits, and another reader notices, before
+            # this read gets to fill the cache
+            with sqlite3.connect(db.db_path) as c:
+                c.execute("UPDATE tracks SET location = 'Genk'")
+            db._check_cache()
+            return iter(tracks)
+
+        db._tracks_from_rows = racing_read
+        assert db.get_all_tracks()[0]['location'] is None
+        del db._tracks_from_rows
+        assert db.get_all_tracks()[0]['location'] == 'Genk'
+
+    def test_non_string_mapping_keys_round_trip(self, db):
+        res = db.add_track('A', 'u', column_mappings={0: 'Status', 1: 'Position'})
+        assert db.get_track_by_id(res['id'])['column_mappings'] == {
+            '0': 'Status', '1': 'Position',
+        }
+
@@ -4,9 +4,13 @@ Focuses on message parsing, column mapping, and time-parsing helpers.
 No database, no WebSocket connection — pure unit tests.
 """
 
+import asyncio
+import sqlite3
+
 import pytest
 
-from apex_timing_websocket import ApexTimingWebSocketParser
+import apex_timing_websocket
+from apex_timing_websocket import ApexTimingWebSocketParser, RowState, new_event_loop, pit_stops_count, runtime_to_seconds
 
 
 # ---------------------------------------------------------------------------
@@ -45,62 +49,50 @@ def _safe_parse_time(time_str, default=float('inf')):
 class TestParseWebSocketMessage:
     """Tests for parse_websocket_message — pipe-delimited message parsing."""
 
+    def test_callable_without_instance(self):
+        """It's a staticmethod, so the hot loop can bind it once."""
+        assert ApexTimingWebSocketParser.parse_websocket_message("a|b|c") == ('a', 'b', 'c')
+
     def test_grid_init_message(self):
         """A grid|html|... message splits into command/parameter/value."""
         parser = ApexTimingWebSocketParser()
         result = parser.parse_websocket_message(
             "grid|html|<table><tr class='head'>...</tr></table>"
         )
-        assert result == {
-            'command': 'grid',
-            'parameter': 'html',
-            'value': "<table><tr class='head'>...</tr></table>",
-        }
+        assert result == ('grid', 'html', "<table><tr class='head'>...</tr></table>")
 
     def test_update_pos_message(self):
         """An upd|pos|... message splits correctly."""
         parser = ApexTimingWebSocketParser()
         result = parser.parse_websocket_message("upd|pos|1|2|3|4")
-        assert result == {
-            'command': 'upd',
-            'parameter': 'pos',
-            'value': '1|2|3|4',
-        }
+        assert result == ('upd', 'pos', '1|2|3|4')
 
     def test_update_with_only_two_parts(self):
         """When there are exactly two pipe-delimited parts, value is empty."""
         parser = ApexTimingWebSocketParser()
         result = parser.parse_websocket_message("cmd|param")
-        assert result == {'command': 'cmd', 'parameter': 'param', 'value': ''}
+        assert result == ('cmd', 'param', '')
 
-    def test_empty_message_returns_empty_dict(self):
-        """Empty string yields {}."""
+    def test_empty_message_returns_none(self):
+        """Empty string yields None."""
         parser = ApexTimingWebSocketParser()
-        assert parser.parse_websocket_message("") == {}
+        assert parser.parse_websocket_message("") is None
 
-    def test_single_part_message_returns_empty_dict(self):
-        """A message with no pipe separator yields {}."""
+    def test_single_part_message_returns_none(self):
+        """A message with no pipe separator yields None."""
         parser = ApexTimingWebSocketParser()
-        assert parser.parse_websocket_message("loneword") == {}
+        assert parser.parse_websocket_message("loneword") is None
 
     def test_message_with_extra_pipes_in_value(self):
         """Everything beyond the second pipe is captured in 'value'."""
         parser = ApexTimingWebSocketParser()
         result = parser.parse_websocket_message("init|grid|<table>|extra|stuff")
-        assert result == {
-            'command': 'init',
-            'parameter': 'grid',
-            'value': '<table>|extra|stuff',
-        }
+        assert result == ('init', 'grid', '<table>|extra|stuff')
 
     def test_title_message(self):
         parser = ApexTimingWebSocketParser()
         result = parser.parse_websocket_message("title|Race Session")
-        assert result == {
-            'command': 'title',
-            'parameter': 'Race Session',
-            'value': '',
-        }
+        assert result == ('title', 'Race Session', '')
 
 
 # ---------------------------------------------------------------------------
@@ -233,6 +225,32 @@ class TestParseTimeToSeconds:
         assert _safe_parse_time("") == float('inf')
 
 
+class TestRuntimeToSeconds:
+    def test_mm_ss(self):
+        assert runtime_to_seconds('12:34') == 754
+
+    def test_plain_seconds(self):
+        assert runtime_to_seconds('90') == 90
+
+    def test_blank_is_zero(self):
+        assert runtime_to_seconds('') == 0
+        assert runtime_to_seconds('  ') == 0
+
+    def test_malformed_raises(self):
+        with pytest.raises(ValueError):
+            runtime_to_seconds('1:xx')
+
+
+class TestPitStopsCount:
+    def test_count(self):
+        assert pit_stops_count(' 3 ') == 3
+
+    def test_pit_time_and_junk_are_zero(self):
+        assert pit_stops_count('00:22') == 0
+        assert pit_stops_count('') == 0
+        assert pit_stops_count('x') == 0
+
+
 # ---------------------------------------------------------------------------
 # process_init_message helper
 # ---------------------------------------------------------------------------
@@ -256,11 +274,7 @@ class TestProcessInitMessage:
             "</tr>"
             "</table>"
         )
-        parser.process_init_message({
-            'command': 'init',
-            'parameter': 'grid',
-            'value': html,
-        })
+        parser.process_init_message('grid', html)
 
         # column_map is built from header cells (0-based indices)
         assert parser.column_map[0] == 'Position'   # data-type='rk'
@@ -271,13 +285,11 @@ class TestProcessInitMessage:
         assert parser.column_map[5] == 'Gap'         # data-type='gap'
         assert parser.column_map[6] == 'Pit Stops'   # data-type='pit'
 
-    def test_grid_init_creates_empty_row_entries(self):
-        """Grid init with data rows creates empty dict entries per row.
+    def test_grid_init_skips_data_rows(self):
+        """Grid init only reads the header; data rows are left to grid/update messages.
 
-        NOTE: Due to a ``continue``-before-field-assignment bug in
-        process_init_message (line 228 jumps over lines 230-246), the
-        per-cell field values are *not* stored; only the row-level
-        empty dicts are created.
+        The per-cell values were never stored here anyway, so the grid
+        starts empty and any rows from a previous grid are dropped.
         """
         parser = ApexTimingWebSocketParser()
         html = (
@@ -299,24 +311,16 @@ class TestProcessInitMessage:
             "</tr>"
             "</table>"
         )
-        parser.process_init_message({
-            'command': 'init',
-            'parameter': 'grid',
-            'value': html,
-        })
-
-        # Rows are registered as keys with empty dicts
-        assert 'r1' in parser.grid_data
-        assert 'r2' in parser.grid_data
-        assert parser.grid_data['r1'] == {}
-        assert parser.grid_data['r2'] == {}
+        parser.grid_data['old'] = RowState(kart='9')
+        parser.row_map['old'] = '9'
+        parser.process_init_message('grid', html)
 
-    def test_grid_init_row_map_not_populated(self):
-        """row_map is NOT populated from data rows due to dead-code bug.
+        assert parser.grid_data == {}
+        assert parser.row_map == {}
+        assert parser.column_map == {0: 'Position', 1: 'Kart', 2: 'Team'}
 
-        The ``continue`` on line 228 skips the row_map assignment on
-        line 246, so row_map stays empty after process_init_message.
-        """
+    def test_grid_init_row_map_not_populated(self):
+        """row_map is not populated from init data rows (only the header is read)."""
         parser = ApexTimingWebSocketParser()
         html = (
             "<table>"
@@ -326,21 +330,303 @@ class TestProcessInitMessage:
             "<tr data-id='r1'><td>99</td></tr>"
             "</table>"
         )
-        parser.process_init_message({
-            'command': 'init',
-            'parameter': 'grid',
-            'value': html,
-        })
+        parser.process_init_message('grid', html)
         assert parser.row_map == {}
 
     def test_non_grid_parameter_is_ignored(self):
         """init messages with parameter != 'grid' don't alter column_map."""
         parser = ApexTimingWebSocketParser()
         cm_before = dict(parser.column_map)
-        parser.process_init_message({
-            'command': 'init',
-            'parameter': 'title',
-            'value': 'Some Title',
-        })
+        parser.process_init_message('title', 'Some Title')
         assert parser.column_map == cm_before
         assert parser.grid_data == {}
+
+
+# ---------------------------------------------------------------------------
+# get_current_standings
+# ---------------------------------------------------------------------------
+
+class TestGetCurrentStandings:
+    """Tests for get_current_standings — plain row dicts, sorted by position."""
+
+    def test_returns_sorted_list_of_dicts(self):
+        parser = ApexTimingWebSocketParser()
+        parser.grid_data = {
+            'r1': RowState(kart='42', position='2', team='Team B'),
+            'r2': RowState(kart='55', position='1', team='Team A'),
+            'r3': RowState(kart='7', position='', team='Team C'),
+        }
+        teams = parser.get_current_standings()
+        assert isinstance(teams, list)
+        assert [t['Kart'] for t in teams] == ['55', '42', '7']
+        assert teams[0]['Status'] == 'On Track'
+        assert teams[0]['Pit Stops'] == '0'
+
+    def test_position_updates_reorder(self):
+        parser = ApexTimingWebSocketParser()
+        parser.data_type_column_map = {1: 'Position'}
+        parser.grid_data = {
+            'r1': RowState(kart='42', position='1'),
+            'r2': RowState(kart='55', position='2'),
+        }
+        parser.process_update_message('r1c2', '|2')
+        parser.process_update_message('r2c2', '|1')
+        assert [t['Kart'] for t in parser.get_current_standings()] == ['55', '42']
+
+    def test_cached_until_a_cell_changes(self):
+        parser = ApexTimingWebSocketParser()
+        parser.data_type_column_map = {4: 'Last Lap'}
+        parser.grid_data = {'r1': RowState(kart='42', position='1')}
+        first = parser.get_current_standings()
+        assert parser.get_current_standings() is first
+
+        parser.process_update_message('r1c5', '|1:00.000')
+        second = parser.get_current_standings()
+        assert second is not first
+        assert second[0]['Last Lap'] == '1:00.000'
+
+        parser.process_clear_message('grid', '')
+        assert parser.get_current_standings() == []
+
+    def test_current_data_frame_reused_while_clean(self):
+        parser = ApexTimingWebSocketParser()
+        parser.grid_data = {'r1': RowState(kart='42', position='1')}
+        df1, _ = asyncio.run(parser.get_current_data())
+        df2, _ = asyncio.run(parser.get_current_data())
+        assert df1 is df2
+        assert list(df1['Kart']) == ['42']
+
+    def test_rows_without_kart_are_skipped(self):
+        parser = ApexTimingWebSocketParser()
+        parser.grid_data = {'r1': RowState(position='1'), 'r2': RowState(kart='')}
+        assert parser.get_current_standings() == []
+
+
+class TestStatusCodes:
+    """Status CSS codes map to display strings in both update paths."""
+
+    @pytest.mark.parametrize('css_class,expected', [
+        ('si', 'Pit-in'), ('so', 'Pit-out'), ('sf', 'Finished'), ('ss', 'Stopped'),
+        ('su', 'Up'), ('sd', 'Down'), ('sr', 'On Track'), ('', 'On Track'),
+    ])
+    def test_css_message(self, css_class, expected):
+        parser = ApexTimingWebSocketParser()
+        parser.process_css_message('r3c1', css_class)
+        assert parser.grid_data['r3'].status == expected
+
+    def test_css_message_matches_code_inside_class_list(self):
+        parser = ApexTimingWebSocketParser()
+        parser.process_css_message('r3c1', 'grp si')
+        assert parser.grid_data['r3'].status == 'Pit-in'
+
+    def test_update_message_status_class(self):
+        parser = ApexTimingWebSocketParser()
+        parser.data_type_column_map = {0: 'Status'}
+        parser.process_update_message('r3c1', 'so|')
+        assert parser.grid_data['r3'].status == 'Pit-out'
+
+
+class TestDirtyTracking:
+    """Cell writes mark rows dirty; only lap-relevant cells request a DB write."""
+
+    def _parser(self):
+        parser = ApexTimingWebSocketParser()
+        parser.data_type_column_map = {0: 'Status', 1: 'Position', 4: 'Last Lap', 8: 'RunTime'}
+        return parser
+
+    def test_last_lap_change_requests_flush(self):
+        parser = self._parser()
+        parser.process_update_message('r7c5', '|1:02.345')
+        assert parser.dirty_rows == {'r7'}
+        assert parser.lap_data_dirty is True
+
+    def test_status_css_only_does_not_request_flush(self):
+        parser = self._parser()
+        parser.process_css_message('r7c1', 'si')
+        parser.process_update_message('r7c2', '|3')
+        assert parser.dirty_rows == {'r7'}
+        assert parser.lap_data_dirty is False
+
+    def test_unchanged_value_is_not_dirty(self):
+        parser = self._parser()
+        parser.process_update_message('r7c9', '|12:00')
+        parser.dirty_rows.clear()
+        parser.lap_data_dirty = False
+        parser.process_update_message('r7c9', '|12:00')
+        assert not parser.dirty_rows
+        assert parser.lap_data_dirty is False
+
+    def test_flush_stores_once_and_resets(self, mocker):
+        parser = self._parser()
+        parser.session_id = 1
+        store = mocker.patch.object(parser, 'store_lap_data')
+        parser.grid_data['r7'] = RowState(kart='7', position='1')
+        parser.process_update_message('r7c5', '|1:02.345')
+        parser.flush_lap_data()
+        parser.flush_lap_data()
+        assert store.call_count == 1
+        assert parser.lap_data_dirty is False
+        assert not parser.dirty_rows
+
+
+class TestStoreLapData:
+    """store_lap_data against a scratch race_data.db."""
+
+    @staticmethod
+    def _team(last_lap, runtime):
+        return {'Position': '1', 'Kart': '7', 'Team': 'Seven', 'Last Lap': last_lap,
+                'Best Lap': last_lap, 'Gap': '', 'RunTime': runtime, 'Pit Stops': '0'}
+
+    def test_new_last_lap_is_recorded_in_history(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        parser = ApexTimingWebSocketParser()
+        session_id = parser.store_session_data('Test', 'Track')
+        parser.store_lap_data(session_id, [self._team('1:00.100', '01:00')])
+        parser.store_lap_data(session_id, [self._team('1:00.100', '01:00')])
+        parser.store_lap_data(session_id, [self._team('59.900', '02:00')])
+
+        with sqlite3.connect('race_data.db') as conn:
+            history = conn.execute(
+                "SELECT kart_number, lap_number, lap_time FROM lap_history"
+            ).fetchall()
+            indexes = {r[1] for r in conn.execute("PRAGMA index_list(lap_times)")}
+        assert history == [(7, 120, '59.900')]
+        assert 'idx_lap_times_session_kart_ts' in indexes
+        parser.close()
+
+    def test_unchanged_kart_is_not_rewritten(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        parser = ApexTimingWebSocketParser()
+        session_id = parser.store_session_data('Test', 'Track')
+        parser.store_lap_data(session_id, [self._team('1:00.100', '01:00')])
+        parser.store_lap_data(session_id, [dict(self._team('1:00.100', '01:30'), Gap='+1.0')])
+        parser.store_lap_data(session_id, [self._team('59.900', '02:00')])
+
+        rows = parser.db.execute("SELECT last_lap FROM lap_times").fetchall()
+        assert rows == [('1:00.100',), ('59.900',)]
+        parser.close()
+
+    def test_malformed_row_is_skipped(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        parser = ApexTimingWebSocketParser()
+        session_id = parser.store_session_data('Test', 'Track')
+        bad = dict(self._team('1:00.100', '01:00'), Kart='8', **{'Pit Stops': 'x'})
+        parser.store_lap_data(session_id, [bad, self._team('1:00.100', '01:00')])
+
+        karts = [r[0] for r in parser.db.execute("SELECT kart_number FROM lap_times")]
+        assert karts == [7]
+        parser.close()
+
+    def test_database_is_not_opened_until_first_write(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        parser = ApexTimingWebSocketParser()
+        assert parser.db is None
+        assert not (tmp_path / 'race_data.db').exists()
+
+        parser.store_session_data('Test', 'Track')
+        assert parser.db is not None
+        assert (tmp_path / 'race_data.db').exists()
+        parser.close()
+
+    def test_reuses_one_connection_until_cleanup(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        parser = ApexTimingWebSocketParser()
+        session_id = parser.store_session_data('Test', 'Track')
+        db = parser.db
+        parser.store_lap_data(session_id, [self._team('1:00.100', '01:00')])
+        assert parser.db is db
+        assert not db.in_transaction
+
+        asyncio.run(parser.cleanup())
+        assert parser.db is None
+        parser.close()  # idempotent
+
+
+class TestProcessMessage:
+    """process_message routes each line of a frame to its handler."""
+
+    def test_session_info_commands(self):
+        parser = ApexTimingWebSocketParser()
+        parser.process_message("title1||Endurance\ntitle2||Final\ncom||Hello\nmsg||Best 1:00\ntrack||Genk")
+        assert parser.session_info == {
+            'title1': 'Endurance', 'title2': 'Final', 'comment': 'Hello',
+            'message': 'Best 1:00', 'track': 'Genk',
+        }
+
+    def test_handlers_and_clear(self):
+        parser = ApexTimingWebSocketParser()
+        parser.process_message("title||Race\ncss|r4c1|si")
+        assert parser.session_info['title'] == 'Race'
+        assert parser.grid_data['r4'].status == 'Pit-in'
+
+        parser.row_map['r4'] = '4'
+        parser.process_message("clear|grid|")
+        assert parser.grid_data == {}
+        assert parser.row_map == {}
+
+
+class TestMessageQueue:
+    """Reader/processor split: frames are drained to a queue and handled in batches."""
+
+    def test_processor_batches_until_end_marker(self, mocker):
+        parser = ApexTimingWebSocketParser()
+        parser.MESSAGE_BATCH_SIZE = 2
+        handled = mocker.patch.object(parser, 'process_message')
+        flush = mocker.patch.object(parser, '_schedule_flush')
+
+        async def run():
+            queue = asyncio.Queue()
+            for frame in ('a', 'b', 'c', None):
+                queue.put_nowait(frame)
+            await parser._process_messages(queue)
+
+        asyncio.run(run())
+        assert [c.args[0] for c in handled.call_args_list] == ['a', 'b', 'c']
+        assert flush.call_count == 2  # [a, b] then [c, None]
+
+    def test_reader_marks_end_even_on_error(self):
+        parser = ApexTimingWebSocketParser()
+
+        class BrokenSocket:
+            def __aiter__(self):
+                return self
+
+            async def __anext__(self):
+                raise ConnectionError('gone')
+
+        parser.websocket = BrokenSocket()
+        queue = asyncio.Queue()
+        with pytest.raises(ConnectionError):
+            asyncio.run(parser._read_messages(queue))
+        assert queue.get_nowait() is None
+
+
+class TestNewEventLoop:
+    def test_runs_coroutines(self):
+        loop = new_event_loop()
+        try:
+            async def answer():
+                return 42
+            assert loop.run_until_complete(answer()) == 42
+        finally:
+            loop.close()
+
+    def test_falls_back_to_stdlib_loop_without_uvloop(self, monkeypatch):
+        monkeypatch.setattr(apex_timing_websocket, 'uvloop', None)
+        loop = new_event_loop()
+        try:
+            assert isinstance(loop, asyncio.BaseEventLoop)
+        finally:
+            loop.close()
+
+
+class TestRowState:
+    def test_unsurfaced_columns_are_not_stored(self):
+        parser = ApexTimingWebSocketParser()
+        parser.data_type_column_map = {0: 'Interval', 1: 'Kart'}
+        parser.process_update_message('r1c1', '|+0.500')
+        parser.process_update_message('r1c2', '|12')
+        assert parser.grid_data['r1'] == RowState(kart='12')
+
+    def test_rows_have_no_instance_dict(self):
+        assert not hasattr(RowState(), '__dict__')
@@ -0,0 +1,465 @@
+"""Tests for TrackSpecificParser's per-track database plumbing.
+
+Each test gets its own race_data_track_N.db under tmp_path, initialised by
+MultiTrackManager exactly as start_track_parser does. No WebSocket.
+"""
+
+import asyncio
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from multi_track_manager import MultiTrackManager, TrackSpecificParser, _parse_gap
+
+
+def _team(kart, position, last_lap, runtime, gap=''):
+    return {
+        'Status': 'On Track', 'Position': str(position), 'Kart': str(kart),
+        'Team': f'Team {kart}', 'Last Lap': last_lap, 'Best Lap': last_lap,
+        'Gap': gap, 'RunTime': runtime, 'Pit Stops': '0',
+    }
+
+
+@pytest.fixture
+def parser(tmp_path):
+    db_path = str(tmp_path / 'race_data_track_42.db')
+    mgr = MultiTrackManager(socketio=None)
+    mgr.get_database_path = lambda _id: db_path  # type: ignore
+    mgr.initialize_track_database(42)
+    p = TrackSpecificParser(42, 'Test Track', db_path)
+    yield p
+    p.close()
+
+
+def _count(db_path, table):
+    with sqlite3.connect(db_path) as c:
+        return c.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+
+class TestSchema:
+    def test_lap_tables_skip_autoincrement(self, parser):
+        with sqlite3.connect(parser.db_path) as c:
+            sql = dict(c.execute("SELECT name, sql FROM sqlite_master WHERE type = 'table'"))
+        assert 'AUTOINCREMENT' not in sql['lap_times']
+        assert 'AUTOINCREMENT' not in sql['lap_history']
+
+    def test_database_file_is_left_in_wal_mode(self, parser):
+        with sqlite3.connect(parser.db_path) as c:
+            assert c.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+
+    def test_runtime_is_stored_as_integer(self, parser):
+        sid = parser.create_new_session()
+        parser.store_lap_data(sid, [_team(1, 1, '1:00.000', '01:00')])
+        parser.flush_pending_writes()
+        with sqlite3.connect(parser.db_path) as c:
+            assert c.execute('SELECT typeof(RunTime), RunTime FROM lap_times').fetchone() == ('integer', 60)
+
+
+class TestConnection:
+    def test_init_does_not_open_the_database(self, parser):
+        assert parser.db is None
+
+    def test_connection_is_reused(self, parser):
+        assert parser.get_db_connection() is parser.get_db_connection()
+
+    def test_per_connection_pragmas_are_applied(self, parser):
+        conn = parser.get_db_connection()
+        assert conn.execute('PRAGMA cache_size').fetchone()[0] == -20000
+        assert conn.execute('PRAGMA temp_store').fetchone()[0] == 2
+
+    def test_create_or_get_session_reuses_by_name(self, parser):
+        sid = parser.create_or_get_session('Race', 'Test Track')
+        assert parser.create_or_get_session('Race', 'Test Track') == sid
+        assert parser.create_or_get_session('Race', 'Other') != sid
+
+    def test_session_insert_waits_for_an_open_flush(self, parser):
+        import threading
+        parser.get_db_connection()
+        result = []
+        with parser._write_lock:
+            worker = threading.Thread(target=lambda: result.append(parser.create_new_session()))
+            worker.start()
+            worker.join(timeout=0.05)
+            assert not result
+        worker.join(timeout=1)
+        assert result
+        assert _count(parser.db_path, 'race_sessions') == 1
+        assert not parser.db.in_transaction
+
+    def test_cleanup_closes_connection(self, parser):
+        parser.get_db_connection()
+        asyncio.run(parser.cleanup())
+        assert parser.db is None
+
+
+class TestSessionMonitoring:
+    def test_runs_as_a_task_and_cleanup_cancels_it(self, parser):
+        checks = []
+        parser.check_interval = 0
+        parser.check_session_status = lambda: checks.append(1)  # type: ignore
+
+        async def scenario():
+            assert parser.start_session_monitoring()
+            assert not parser.start_session_monitoring()
+            task = parser.monitor_task
+            while len(checks) < 2:
+                await asyncio.sleep(0.01)
+            await parser.cleanup()
+            assert task.cancelled()
+            assert parser.monitor_task is None
+
+        asyncio.run(scenario())
+
+
+class TestStoreLapData:
+    def test_writes_lap_times_and_lap_history(self, parser):
+        sid = parser.create_new_session()
+        parser.store_lap_data(sid, [_team(1, 1, '1:00.000', '01:00')])
+        parser.store_lap_data(sid, [_team(1, 1, '1:00.500', '02:00')])
+        parser.flush_pending_writes()
+        assert _count(parser.db_path, 'lap_times') == 2
+        assert _count(parser.db_path, 'lap_history') == 1
+        assert not parser.db.in_transaction
+
+    def test_status_reports_last_stored_team_count(self, parser):
+        mgr = MultiTrackManager(socketio=None)
+        mgr.parsers[42] = parser
+        sid = parser.create_new_session()
+        parser.store_lap_data(sid, [_team(1, 1, '1:00.000', '01:00'),
+                                    _team(2, 2, '1:01.000', '01:01')])
+        assert mgr.get_all_tracks_status()[0]['teams_count'] == 2
+
+    def test_previous_state_is_reseeded_from_latest_rows(self, parser):
+        sid = parser.create_new_session()
+        parser.store_lap_data(sid, [_team(1, 1, '1:00.000', '01:00')])
+        parser.store_lap_data(sid, [_team(1, 1, '1:00.500', '02:00')])
+        parser.previous_state_cache.clear()
+        parser.store_lap_data(sid, [_team(1, 1, '1:00.500', '02:10')])
+        assert parser.previous_state_cache[sid][1]['RunTime'] == 130
+        parser.flush_pending_writes()
+        # The reseed saw the 02:00 row, so nothing new was recorded
+        assert _count(parser.db_path, 'lap_times') == 2
+        assert _count(parser.db_path, 'lap_history') == 1
+
+    def test_rows_are_buffered_until_flush(self, parser):
+        sid = parser.create_new_session()
+        parser.store_lap_data(sid, [_team(1, 1, '1:00.000', '01:00')])
+        assert _count(parser.db_path, 'lap_times') == 0
+        parser.flush_pending_writes()
+        assert _count(parser.db_path, 'lap_times') == 1
+
+    def test_batch_size_triggers_flush(self, parser):
+        parser.WRITE_BATCH_ROWS = 2
+        sid = parser.create_new_session()
+        parser.store_lap_data(sid, [_team(1, 1, '1:00.000', '01:00'),
+                                    _team(2, 2, '1:01.000', '01:01')])
+        assert _count(parser.db_path, 'lap_times') == 2
+
+    def test_failed_flush_keeps_rows_for_the_next_one(self, parser):
+        sid = parser.create_new_session()
+        parser.store_lap_data(sid, [_team(1, 1, '1:00.000', '01:00')])
+        parser.store_lap_data(sid, [_team(1, 1, '1:00.500', '02:00')])
+        blocker = sqlite3.connect(parser.db_path)
+        blocker.execute('BEGIN IMMEDIATE')
+        parser.get_db_connection().execute('PRAGMA busy_timeout=0')
+        parser.flush_pending_writes()
+        assert len(parser._pending_current) == 2
+        assert len(parser._pending_history) == 1
+        assert not parser.db.in_transaction
+
+        blocker.rollback()
+        blocker.close()
+        parser.flush_pending_writes()
+        assert _count(parser.db_path, 'lap_times') == 2
+        assert _count(parser.db_path, 'lap_history') == 1
+
+    def test_quiet_feed_is_flushed_by_loop_timer(self, parser):
+        parser.WRITE_FLUSH_INTERVAL = 0.05
+        parser.check_interval = 3600
+        sid = parser.create_new_session()
+
+        async def scenario():
+            parser.start_session_monitoring()
+            await parser.run_db(parser.store_lap_data, sid, [_team(1, 1, '1:00.000', '01:00')])
+            assert _count(parser.db_path, 'lap_times') == 0
+            await asyncio.sleep(0.2)
+            assert _count(parser.db_path, 'lap_times') == 1
+            await parser.stop_session_monitoring()
+
+        asyncio.run(scenario())
+
+    def test_close_flushes_pending_rows(self, parser):
+        sid = parser.create_new_session()
+        parser.store_lap_data(sid, [_team(1, 1, '1:00.000', '01:00')])
+        parser.close()
+        assert _count(parser.db_path, 'lap_times') == 1
+
+
+class TestStartStopAllParsers:
+    def test_stop_cancels_every_track_and_start_returns(self, monkeypatch):
+        mgr = MultiTrackManager(socketio=None)
+        mgr.load_tracks = lambda: [{'id': 1}, {'id': 2}]  # type: ignore
+
+        async def run_forever(track):
+            await asyncio.Event().wait()
+
+        monkeypatch.setattr(mgr, 'start_track_parser', run_forever)
+
+        async def scenario():
+            runner = asyncio.create_task(mgr.start_all_parsers())
+            await asyncio.sleep(0)
+            tasks = list(mgr.tasks.values())
+            assert len(tasks) == 2
+            await mgr.stop_all_parsers()
+            await asyncio.wait_for(runner, timeout=1)
+            assert all(t.cancelled() for t in tasks)
+            assert not mgr.tasks
+
+        asyncio.run(scenario())
+
+    def test_one_track_cancelled_keeps_the_others_running(self, monkeypatch):
+        mgr = MultiTrackManager(socketio=None)
+        mgr.load_tracks = lambda: [{'id': 1}, {'id': 2}]  # type: ignore
+
+        async def run_forever(track):
+            await asyncio.Event().wait()
+
+        monkeypatch.setattr(mgr, 'start_track_parser', run_forever)
+
+        async def scenario():
+            runner = asyncio.create_task(mgr.start_all_parsers())
+            await asyncio.sleep(0)
+            assert await mgr.stop_track_parser(1)
+            await asyncio.sleep(0)
+            assert not runner.done()
+            assert not mgr.tasks[2].done()
+            await mgr.stop_all_parsers()
+            await asyncio.wait_for(runner, timeout=1)
+
+        asyncio.run(scenario())
+
+
+class _RecordingSocketIO:
+    def __init__(self):
+        self.events = []
+        self.payloads = []
+
+    def emit(self, event, data=None, room=None):
+        self.events.append((event, room))
+        self.payloads.append(data)
+
+
+class TestBroadcastAllTracksStatus:
+    def test_calls_inside_the_window_collapse_into_one_trailing_emit(self):
+        sio = _RecordingSocketIO()
+        mgr = MultiTrackManager(socketio=sio)
+        mgr.ALL_TRACKS_BROADCAST_INTERVAL = 0.2
+        for _ in range(5):
+            mgr.broadcast_all_tracks_status()
+        timer = mgr._broadcast_timer
+        assert sio.events == [('all_tracks_status', 'all_tracks')]
+        timer.join(timeout=1)
+        assert len(sio.events) == 2
+
+
+class TestRunDb:
+    def test_uses_the_managers_shared_pool(self, tmp_path):
+        import threading
+        mgr = MultiTrackManager(socketio=None)
+        a = TrackSpecificParser(1, 'A', str(tmp_path / 'a.db'), manager=mgr)
+        b = TrackSpecificParser(2, 'B', str(tmp_path / 'b.db'), manager=mgr)
+
+        async def scenario():
+            name = lambda: threading.current_thread().name  # noqa: E731
+            return await a.run_db(name), await b.run_db(name)
+
+        names = asyncio.run(scenario())
+        assert all(n.startswith('track-db') for n in names)
+        asyncio.run(mgr.stop_all_parsers())
+        assert mgr._db_executor is None
+
+
+    def test_cleanup_waits_for_a_call_still_on_the_pool(self, parser):
+        import threading
+        parser.manager = MultiTrackManager(socketio=None)
+        started, release = threading.Event(), threading.Event()
+        saw_open_db = []
+
+        def slow_write():
+            started.set()
+            release.wait(1)
+            saw_open_db.append(parser.db is not None)
+
+        async def scenario():
+            parser.get_db_connection()
+            write = asyncio.create_task(parser.run_db(slow_write))
+            await asyncio.to_thread(started.wait, 1)
+            write.cancel()  # Doesn't stop the worker
+            cleanup = asyncio.create_task(parser.cleanup())
+            await asyncio.sleep(0.05)
+            assert not cleanup.done()
+            release.set()
+            await cleanup
+            await parser.manager.stop_all_parsers()
+
+        asyncio.run(scenario())
+        assert saw_open_db == [True]
+        assert parser.db is None
+
+
+class _FakeWebSocket:
+    def __init__(self, messages):
+        self._messages = iter(messages)
+
+    async def send(self, message):
+        pass
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        # One frame per loop pass, like a live feed, so nothing coalesces
+        await asyncio.sleep(0.01)
+        try:
+            return next(self._messages)
+        except StopIteration:
+            raise asyncio.CancelledError
+
+    async def close(self):
+        pass
+
+
+class TestStartMonitoring:
+    HEAD = ("<table><tr class='head'><td data-type='rk'>Pos</td><td data-type='no'>Kart</td>"
+            "<td data-type='dr'>Team</td><td data-type='llp'>Last</td><td data-type='otr'>OT</td></tr>"
+            "<tr data-id='r1'><td>1</td><td>11</td><td>Alpha</td><td>1:00.000</td><td>01:00</td></tr>"
+            "</table>")
+
+    def test_messages_without_cell_changes_are_not_stored(self, parser, monkeypatch):
+        messages = ['grid||' + self.HEAD, 'com||hello', 'css|r1c1|sr', 'r1c4||1:00.500\nr1c5||02:00']
+        parser.start_session_monitoring = lambda: False  # type: ignore
+
+        async def fake_connect(url):
+            parser.websocket = _FakeWebSocket(messages)
+            return True
+
+        stored = []
+        monkeypatch.setattr(parser, 'connect_websocket', fake_connect)
+        monkeypatch.setattr(parser, 'store_lap_data', lambda sid, teams: stored.append(sid))
+        with pytest.raises(asyncio.CancelledError):
+            asyncio.run(parser.start_monitoring('ws://test'))
+        assert len(stored) == 2
+
+    def test_backlog_is_applied_then_stored_once(self, parser, monkeypatch):
+        stored = []
+        monkeypatch.setattr(parser, 'store_lap_data', lambda sid, teams: stored.append(
+            [t['Last Lap'] for t in teams]))
+
+        async def scenario():
+            queue = asyncio.Queue()
+            for frame in ('grid||' + self.HEAD, 'r1c4||1:00.500', 'r1c4||1:00.700', None):
+                queue.put_nowait(frame)
+            await parser._process_track_messages(queue)
+
+        asyncio.run(scenario())
+        assert stored == [['1:00.700']]
+
+    def test_com_only_batch_keeps_the_feed_alive(self, parser, monkeypatch):
+        monkeypatch.setattr(parser, 'store_lap_data', lambda sid, teams: None)
+
+        async def drain(*frames):
+            queue = asyncio.Queue()
+            for frame in frames + (None,):
+                queue.put_nowait(frame)
+            await parser._process_track_messages(queue)
+
+        asyncio.run(drain('grid||' + self.HEAD, 'r1c4||1:00.500'))
+        stamped = parser.last_data_time = datetime(2000, 1, 1)
+        asyncio.run(drain('com||hello', 'title||Race'))
+        assert parser.last_data_time > stamped
+
+    def test_apply_track_message_uses_the_command_handlers(self, parser):
+        seen = []
+        parser._command_handlers['title'] = lambda param, value: seen.append(value)
+        parser.apply_track_message('grid||' + self.HEAD + '\ntitle||Race\ncom||hello\ntrack||Genk\nr1c4||1:00.500')
+        assert seen == ['Race']
+        assert parser.session_info == {'comment': 'hello', 'track': 'Genk'}
+        assert parser.grid_data['r1'].last_lap == '1:00.500'
+
+
+class TestParseGap:
+    @pytest.mark.parametrize('gap, expected', [
+        ('+12.456', 12.456), ('12.456', 12.456), (' +1.5 ', 1.5),
+        ('Leader', 0.0), ('LEADER', 0.0), ('', 0.0), (None, 0.0),
+        ('Tour 5', 0.0), ('1 Tour', 0.0),
+    ])
+    def test_values(self, gap, expected):
+        assert _parse_gap(gap) == expected
+
+
+class TestEmitTeamSpecificUpdates:
+    def test_gaps_to_neighbours(self, tmp_path):
+        sio = _RecordingSocketIO()
+        p = TrackSpecificParser(7, 'T', str(tmp_path / 't.db'), socketio=sio)
+        teams = [_team(1, 1, '1:00.000', '10:00', gap='Tour 5'),
+                 _team(2, 2, '1:00.000', '10:00', gap='+1.500'),
+                 _team(3, 3, '1:00.000', '10:00', gap='+4.000')]
+        p.emit_team_specific_updates(teams, 1, 'ts')
+
+        assert sio.events == [('team_specific_update', f'team_track_7_Team {k}') for k in (1, 2, 3)]
+        assert [(u['Position'], u['gap_to_front'], u['gap_to_behind']) for u in sio.payloads] == [
+            ('1', '-', '1.500'), ('2', '1.500', '2.500'), ('3', '2.500', '-')]
+
+    def test_only_occupied_team_rooms_are_emitted_to(self, tmp_path):
+        from types import SimpleNamespace
+        sio = _RecordingSocketIO()
+        rooms = {'team_track_7_Team 2': {'sid-a': 'eio-a'}, 'team_track_7_Team 3': {}}
+        sio.server = SimpleNamespace(manager=SimpleNamespace(rooms={'/': rooms}))
+        p = TrackSpecificParser(7, 'T', str(tmp_path / 't.db'), socketio=sio)
+        teams = [_team(1, 1, '1:00.000', '10:00', gap='Tour 5'),
+                 _team(2, 2, '1:00.000', '10:00', gap='+1.500'),
+                 _team(3, 3, '1:00.000', '10:00', gap='+4.000')]
+        p.emit_team_specific_updates(teams, 1, 'ts')
+
+        assert sio.events == [('team_specific_update', 'team_track_7_Team 2')]
+        assert (sio.payloads[0]['gap_to_front'], sio.payloads[0]['gap_to_behind']) == ('1.500', '2.500')
+
+    def test_blank_position_falls_back_to_row_order(self, tmp_path):
+        sio = _RecordingSocketIO()
+        p = TrackSpecificParser(7, 'T', str(tmp_path / 't.db'), socketio=sio)
+        teams = [_team(1, 1, '1:00.000', '10:00'), _team(2, '', '1:00.000', '10:00', gap='+2.000')]
+        p.emit_team_specific_updates(teams, 1, 'ts')
+        assert [(u['Position'], u['gap_to_front']) for u in sio.payloads] == [('1', '-'), ('2', '2.000')]
+
+    def test_non_positive_position_falls_back_to_row_order(self, tmp_path):
+        sio = _RecordingSocketIO()
+        p = TrackSpecificParser(7, 'T', str(tmp_path / 't.db'), socketio=sio)
+        teams = [_team(1, '0', '1:00.000', '10:00'), _team(2, '-1', '1:00.000', '10:00', gap='+2.000')]
+        p.emit_team_specific_updates(teams, 1, 'ts')
+        assert [(u['Position'], u['gap_to_front']) for u in sio.payloads] == [('1', '-'), ('2', '2.000')]
+
+    def test_room_names_are_cached_per_team(self, tmp_path):
+        sio = _RecordingSocketIO()
+        p = TrackSpecificParser(7, 'T', str(tmp_path / 't.db'), socketio=sio)
+        p.emit_team_specific_updates([_team(1, 1, '1:00.000', '10:00')], 1, 'ts')
+        room = p._team_rooms['Team 1']
+        p.emit_team_specific_updates([_team(1, 1, '1:00.500', '11:00')], 1, 'ts')
+        assert sio.events[1][1] is room == 'team_track_7_Team 1'
+
+    def test_unchanged_payloads_are_not_resent(self, tmp_path):
+        sio = _RecordingSocketIO()
+        p = TrackSpecificParser(7, 'T', str(tmp_path / 't.db'), socketio=sio)
+        teams = [_team(1, 1, '1:00.000', '10:00'), _team(2, 2, '1:00.000', '10:00', gap='+1.000')]
+        p.emit_team_specific_updates(teams, 1, 'ts')
+        p.emit_team_specific_updates(teams, 1, 'ts')
+        assert len(sio.events) == 2
+
+        teams[1] = _team(2, 2, '1:00.000', '10:00', gap='+1.200')
+        p.emit_team_specific_updates(teams, 1, 'ts')
+        assert [room for _, room in sio.events[2:]] == ['team_track_7_Team 1', 'team_track_7_Team 2']
+
+        p.forget_team_update('Team 1')
+        p.emit_team_specific_updates(teams, 1, 'ts')
+        assert sio.events[-1] == ('team_specific_update', 'team_track_7_Team 1')
+        assert len(sio.events) == 5